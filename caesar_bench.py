@@ -0,0 +1,400 @@
+"""
+Caesar cipher benchmarks
+Measure how Caesar.encrypt and Caesar.decrypt scale with message length.
+Every implementation in IMPLEMENTATIONS is run over messages from 1 KB to
+100 MB built from different mixes of letters and non-letters. For each case
+the throughput (MB/s) and the peak memory reported by tracemalloc are
+recorded. Results can be saved as a JSON baseline and later runs compared
+against it, so a slowdown in the hot path is flagged instead of going
+unnoticed. Each case is also timed against a fixed reference workload, and
+only a drop in both the throughput and the relative cost is flagged, so a
+machine that is busy for a while does not produce false regressions.
+
+    python caesar_bench.py --save baseline.json
+    python caesar_bench.py --compare baseline.json
+    python caesar_bench.py --profile --sizes 100KB
+"""
+
+import argparse
+import cProfile
+import gc
+import importlib.util
+import io
+import json
+import math
+import os
+import platform
+import pstats
+import random
+import statistics
+import string
+import sys
+import time
+import tracemalloc
+
+KB = 1024
+MB = 1024 * KB
+
+DEFAULT_SIZES = [1 * KB, 10 * KB, 100 * KB, 1 * MB, 10 * MB, 100 * MB]
+DEFAULT_KEY = 13
+MIN_BATCH_SECONDS = 0.01
+MIN_CASE_SECONDS = 0.5
+LONG_CALL_SECONDS = 1.0  # calls expected to take longer are only timed once
+
+# Character pools for the different input mixes
+MIXES = {
+    'letters': string.ascii_uppercase,
+    'text': string.ascii_letters * 4 + ' ' * 16 + '.,;:!?\'"-\n',
+    'symbols': string.ascii_uppercase + string.digits * 3 + string.punctuation * 2 + ' ' * 8,
+}
+
+
+def load_untitled_caesar():
+    """Load the Caesar class from Untitled-1.py (not importable by name)"""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Untitled-1.py')
+    spec = importlib.util.spec_from_file_location('untitled_1', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.Caesar
+
+
+# name -> callable returning a class with encrypt(message, key) / decrypt(message, key)
+IMPLEMENTATIONS = {
+    'Untitled-1.Caesar': load_untitled_caesar,
+}
+
+
+def parse_size(text):
+    """Parse sizes such as '512', '10KB' or '1MB' into a number of bytes"""
+    text = text.strip().upper()
+    for suffix, factor in (('MB', MB), ('KB', KB), ('B', 1)):
+        if text.endswith(suffix):
+            return int(float(text[:-len(suffix)]) * factor)
+    return int(text)
+
+
+def format_size(size):
+    if size >= MB and size % MB == 0:
+        return f"{size // MB}MB"
+    if size >= KB and size % KB == 0:
+        return f"{size // KB}KB"
+    return f"{size}B"
+
+
+def make_message(size, mix, seed=0):
+    """Build a deterministic message of exactly size characters"""
+    rng = random.Random(seed)
+    pool = MIXES[mix]
+    block = ''.join(rng.choice(pool) for _ in range(min(size, 64 * KB)))
+    repeats, remainder = divmod(size, len(block))
+    return block * repeats + block[:remainder]
+
+
+def reference_workload(message, key):
+    """Fixed pure Python loop timed next to every case to gauge the machine speed"""
+    out = ''
+    for symbol in message:
+        out = out + chr((ord(symbol) + key) % 128)
+    return out
+
+
+REFERENCE_MESSAGE = make_message(4 * KB, 'text', seed=2)
+
+
+def time_batch(func, message, key, number):
+    """Return the wall time of number back to back calls and the last result"""
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        for _ in range(number):
+            result = func(message=message, key=key)
+        elapsed = time.perf_counter() - start
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return elapsed, result
+
+
+def autorange(func, message, key, min_batch=MIN_BATCH_SECONDS):
+    """Like timeit.Timer.autorange, double the calls per batch until it takes min_batch seconds
+
+    Returns (number, elapsed, result) of the last batch, which is a valid sample.
+    """
+    number = 1
+    while True:
+        elapsed, result = time_batch(func, message, key, number)
+        if elapsed >= min_batch:
+            return number, elapsed, result
+        number *= 2
+
+
+def time_call(func, message, key, repeat, min_batch=MIN_BATCH_SECONDS,
+              min_total=MIN_CASE_SECONDS):
+    """Return the median seconds per call, the median cost per reference call and the last result
+
+    Batches are repeated at least repeat times and until min_total seconds
+    were spent. Every batch is followed by a batch of reference_workload: a
+    shared machine can run twice as slow for many seconds, which slows both
+    batches of a pair alike, so their ratio stays put where the raw timings
+    do not.
+    """
+    reference_number, _, _ = autorange(reference_workload, REFERENCE_MESSAGE, key, min_batch)
+    # The last autorange batch is the first sample, a call that already takes
+    # min_batch on its own is not run again just to size the batches
+    number, elapsed, result = autorange(func, message, key, min_batch)
+
+    samples = []
+    ratios = []
+    total = 0.0
+    while True:
+        reference, _ = time_batch(reference_workload, REFERENCE_MESSAGE, key, reference_number)
+        samples.append(elapsed / number)
+        ratios.append(samples[-1] / (reference / reference_number))
+        total += elapsed + reference
+        if len(samples) >= repeat and total >= min_total:
+            return statistics.median(samples), statistics.median(ratios), result
+        elapsed, result = time_batch(func, message, key, number)
+
+
+def peak_memory(func, message, key):
+    """Return the peak bytes allocated by a single call"""
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        func(message=message, key=key)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def estimate_seconds(history, size):
+    """Extrapolate the seconds per call at size from [(size, seconds), ...] of smaller sizes
+
+    The growth between the last two sizes is assumed to continue, and to be
+    at least linear, so a quadratic implementation is caught before it runs.
+    """
+    if not history:
+        return 0.0
+    last_size, last_seconds = history[-1]
+    exponent = 1.0
+    if len(history) > 1:
+        previous_size, previous_seconds = history[-2]
+        if previous_seconds > 0 and last_seconds > 0 and last_size > previous_size:
+            exponent = max(exponent, math.log(last_seconds / previous_seconds)
+                           / math.log(last_size / previous_size))
+    return last_seconds * (size / last_size) ** exponent
+
+
+def run_case(cipher, op, message, key, repeat, measure_memory):
+    """Benchmark one operation on one message"""
+    func = getattr(cipher, op)
+    # decrypt is measured on real ciphertext rather than plain text
+    if op == 'decrypt':
+        message = cipher.encrypt(message=message, key=key)
+    elapsed, relative_cost, result = time_call(func, message, key, repeat)
+    case = {
+        'seconds': elapsed,
+        'mb_per_s': (len(message) / MB) / elapsed if elapsed > 0 else None,
+        'relative_cost': relative_cost,
+        'output_chars': len(result),
+    }
+    if measure_memory:
+        case['peak_bytes'] = peak_memory(func, message, key)
+    return case
+
+
+def run_benchmarks(impls, sizes, mixes, ops, key=DEFAULT_KEY, repeat=5,
+                   max_seconds=30.0, memory=True, verbose=True):
+    """Run every implementation/mix/op over every size
+
+    Sizes are run in increasing order. A size whose call is expected to take
+    longer than max_seconds, extrapolated from the smaller sizes, is recorded
+    as skipped with the larger sizes of that series, since a quadratic
+    implementation would otherwise run for hours.
+    """
+    results = []
+    for impl_name in impls:
+        cipher = IMPLEMENTATIONS[impl_name]()()
+        for mix in mixes:
+            for op in ops:
+                too_slow = None
+                history = []  # (size, seconds per call) of this series so far
+                for size in sorted(sizes):
+                    entry = {
+                        'impl': impl_name,
+                        'op': op,
+                        'mix': mix,
+                        'size': size,
+                    }
+                    estimate = estimate_seconds(history, size)
+                    if too_slow is None and estimate > max_seconds:
+                        too_slow = f"estimated {estimate:.0f}s per call, over {max_seconds}s"
+                    if too_slow:
+                        entry['skipped'] = too_slow
+                        results.append(entry)
+                        if verbose:
+                            print(f"{impl_name:20} {op:8} {mix:8} {format_size(size):>6}  "
+                                  f"skipped, {too_slow}")
+                        continue
+
+                    message = make_message(size, mix)
+                    # Long calls are only timed once, they dominate the total time
+                    runs = repeat if estimate <= LONG_CALL_SECONDS else 1
+                    entry.update(run_case(cipher, op, message, key, runs, memory))
+                    results.append(entry)
+                    history.append((size, entry['seconds']))
+
+                    if verbose:
+                        throughput = f"{entry['mb_per_s']:10.3f}" if entry['mb_per_s'] else f"{'-':>10}"
+                        line = (f"{impl_name:20} {op:8} {mix:8} {format_size(size):>6}  "
+                                f"{throughput} MB/s  {entry['seconds']:9.4f}s")
+                        if 'peak_bytes' in entry:
+                            line += f"  peak {entry['peak_bytes'] / MB:9.2f} MB"
+                        print(line)
+
+                    if entry['seconds'] > max_seconds:
+                        too_slow = f"previous size exceeded {max_seconds}s"
+    return results
+
+
+def check_roundtrip(impls, key=DEFAULT_KEY):
+    """Make sure decrypt(encrypt(m)) gives back the upper-cased message"""
+    for impl_name in impls:
+        cipher = IMPLEMENTATIONS[impl_name]()()
+        for mix in MIXES:
+            message = make_message(4 * KB, mix, seed=1)
+            encrypted = cipher.encrypt(message=message, key=key)
+            if cipher.decrypt(message=encrypted, key=key) != message.upper():
+                raise AssertionError(f"{impl_name} does not round-trip the '{mix}' mix")
+
+
+def case_id(entry):
+    return f"{entry['impl']}|{entry['op']}|{entry['mix']}|{entry['size']}"
+
+
+def is_slower(old, entry, tolerance):
+    """True when entry's throughput dropped by more than tolerance against old"""
+    if not old.get('mb_per_s') or not entry.get('mb_per_s'):
+        return False
+    if entry['mb_per_s'] >= old['mb_per_s'] * (1 - tolerance):
+        return False
+    # A slow spell of the machine slows the reference as well, a real
+    # regression also shows in the cost relative to the reference workload
+    if old.get('relative_cost') and entry.get('relative_cost'):
+        return entry['relative_cost'] * (1 - tolerance) > old['relative_cost']
+    return True
+
+
+def compare(baseline, results, tolerance):
+    """Return a list of human readable regressions against a baseline"""
+    previous = {case_id(entry): entry for entry in baseline['results']}
+    regressions = []
+    for entry in results:
+        old = previous.get(case_id(entry))
+        if old is None or 'skipped' in old or not old.get('mb_per_s'):
+            continue
+        name = f"{entry['impl']} {entry['op']} {entry['mix']} {format_size(entry['size'])}"
+        if 'skipped' in entry:
+            regressions.append(f"{name}: skipped, baseline ran at {old['mb_per_s']:.3f} MB/s")
+            continue
+        if is_slower(old, entry, tolerance):
+            regressions.append(f"{name}: throughput {old['mb_per_s']:.3f} -> "
+                               f"{entry['mb_per_s']:.3f} MB/s")
+        if 'peak_bytes' in entry and 'peak_bytes' in old:
+            if entry['peak_bytes'] > old['peak_bytes'] * (1 + tolerance):
+                regressions.append(f"{name}: peak memory {old['peak_bytes'] / MB:.2f} -> "
+                                   f"{entry['peak_bytes'] / MB:.2f} MB")
+    return regressions
+
+
+def profile(impls, sizes, mixes, ops, key=DEFAULT_KEY, top=15):
+    """Print the cProfile hot spots for the smallest requested size"""
+    size = min(sizes)
+    for impl_name in impls:
+        cipher = IMPLEMENTATIONS[impl_name]()()
+        for mix in mixes:
+            message = make_message(size, mix)
+            for op in ops:
+                profiler = cProfile.Profile()
+                profiler.enable()
+                getattr(cipher, op)(message=message, key=key)
+                profiler.disable()
+                out = io.StringIO()
+                pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(top)
+                print(f"== {impl_name} {op} {mix} {format_size(size)} ==")
+                print(out.getvalue())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Caesar encrypt/decrypt")
+    parser.add_argument('--impl', action='append', choices=sorted(IMPLEMENTATIONS),
+                        help="implementation to run (default: all)")
+    parser.add_argument('--sizes', default=','.join(format_size(s) for s in DEFAULT_SIZES),
+                        help="comma separated message sizes, e.g. 1KB,1MB")
+    parser.add_argument('--mix', action='append', choices=sorted(MIXES),
+                        help="input mix to run (default: all)")
+    parser.add_argument('--op', action='append', choices=['encrypt', 'decrypt'],
+                        help="operation to run (default: both)")
+    parser.add_argument('--key', type=int, default=DEFAULT_KEY)
+    parser.add_argument('--repeat', type=int, default=5,
+                        help="minimum timed batches per case up to 1MB, the median is kept")
+    parser.add_argument('--max-seconds', type=float, default=30.0,
+                        help="skip sizes whose call is expected to take longer than this")
+    parser.add_argument('--no-memory', action='store_true',
+                        help="skip the tracemalloc peak memory run")
+    parser.add_argument('--save', metavar='PATH', help="write results as a JSON baseline")
+    parser.add_argument('--compare', metavar='PATH', help="compare against a JSON baseline")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="allowed relative slowdown/memory growth before flagging")
+    parser.add_argument('--profile', action='store_true',
+                        help="print cProfile hot spots instead of benchmarking")
+    args = parser.parse_args(argv)
+
+    impls = args.impl or sorted(IMPLEMENTATIONS)
+    sizes = [parse_size(s) for s in args.sizes.split(',') if s.strip()]
+    if not sizes or min(sizes) < 1:
+        parser.error("--sizes must be at least 1 byte each")
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+    mixes = args.mix or list(MIXES)
+    ops = args.op or ['encrypt', 'decrypt']
+
+    check_roundtrip(impls, args.key)
+
+    if args.profile:
+        profile(impls, sizes, mixes, ops, args.key)
+        return 0
+
+    results = run_benchmarks(impls, sizes, mixes, ops, key=args.key, repeat=args.repeat,
+                             max_seconds=args.max_seconds, memory=not args.no_memory)
+
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'key': args.key,
+        'results': results,
+    }
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved {len(results)} results to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, results, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s) against {args.compare}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print(f"No regressions against {args.compare}")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,5 +1,9 @@
 import pygame
+import multiprocessing
+import queue
 import sys
+import threading
+import time
 
 # Initialize Pygame
 pygame.init()
@@ -24,9 +28,66 @@ PIECES = {
 }
 
 
+START_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w - - 0 1'
+FILES = 'abcdefgh'
+
+
+def square_name(row, col):
+    """Algebraic name of a square, e.g. (6, 4) -> 'e2'"""
+    return FILES[col] + str(ROWS - row)
+
+
+def parse_square(text):
+    if len(text) != 2 or text[0] not in FILES or not text[1].isdigit():
+        raise ValueError(f"Invalid square: {text}")
+    row, col = ROWS - int(text[1]), FILES.index(text[0])
+    if not (0 <= row < ROWS and 0 <= col < COLS):
+        raise ValueError(f"Invalid square: {text}")
+    return row, col
+
+
+def parse_move(text):
+    """Parse a UCI move such as 'e2e4' or 'e7e8q' into (start_row, start_col, end_row, end_col, promotion)"""
+    if len(text) not in (4, 5):
+        raise ValueError(f"Invalid move: {text}")
+    start_row, start_col = parse_square(text[0:2])
+    end_row, end_col = parse_square(text[2:4])
+    promotion = text[4].upper() if len(text) == 5 else None
+    if promotion and promotion not in 'QRBN':
+        raise ValueError(f"Invalid promotion: {text}")
+    return start_row, start_col, end_row, end_col, promotion
+
+
+def move_to_uci(board, move):
+    """Format a (start_row, start_col, end_row, end_col) move played on board"""
+    start_row, start_col, end_row, end_col = move[:4]
+    text = square_name(start_row, start_col) + square_name(end_row, end_col)
+    piece = board.get_piece(start_row, start_col)
+    if piece and piece.piece_type == 'P' and end_row in (0, ROWS - 1):
+        promotion = move[4] if len(move) > 4 and move[4] else 'Q'
+        text += promotion.lower()
+    return text
+
+
 class PieceRenderer:
     """Custom piece renderer with distinctive designs for each piece"""
 
+    _atlases = {}
+
+    @staticmethod
+    def get_atlas(size):
+        """Pre-rendered sprites for every piece at the given square size, shared by all callers"""
+        atlas = PieceRenderer._atlases.get(size)
+        if atlas is None:
+            atlas = {}
+            for color in ('white', 'black'):
+                for piece_type in 'KQRBNP':
+                    sprite = pygame.Surface((size, size), pygame.SRCALPHA)
+                    PieceRenderer.draw_piece(sprite, piece_type, color, 0, 0, size)
+                    atlas[piece_type, color] = sprite
+            PieceRenderer._atlases[size] = atlas
+        return atlas
+
     @staticmethod
     def draw_piece(surface, piece_type, color, x, y, size):
         """Draw a chess piece with custom design at the given position"""
@@ -218,6 +279,7 @@ class Board:
         self.white_king_pos = (7, 4)
         self.black_king_pos = (0, 4)
         self.pending_promotion = None  # (row, col) of pawn to promote
+        self.revision = 0  # bumped whenever the position changes
         self.setup_board()
 
     def setup_board(self):
@@ -263,6 +325,7 @@ class Board:
             self.board[end_row][end_col] = piece
             self.board[start_row][start_col] = None
             piece.move(end_row, end_col)
+            self.revision += 1
 
             # Check for pawn promotion
             if piece.piece_type == 'P':
@@ -278,8 +341,132 @@ class Board:
         if piece and piece.piece_type == 'P':
             piece.piece_type = new_piece_type
             self.pending_promotion = None
+            self.revision += 1
             self.current_turn = 'black' if self.current_turn == 'white' else 'white'
 
+    def make_move(self, start_row, start_col, end_row, end_col, promotion='Q'):
+        """Play a move (promoting to the given piece) and return the info needed to undo it"""
+        piece = self.board[start_row][start_col]
+        undo = (piece, start_row, start_col, end_row, end_col, self.board[end_row][end_col],
+                piece.has_moved, piece.piece_type, self.current_turn,
+                self.white_king_pos, self.black_king_pos, self.pending_promotion)
+
+        self.move_piece(start_row, start_col, end_row, end_col)
+        if self.pending_promotion:
+            self.promote_pawn(end_row, end_col, promotion or 'Q')
+        return undo
+
+    def undo_move(self, undo):
+        """Take back a move played with make_move"""
+        (piece, start_row, start_col, end_row, end_col, captured, has_moved, piece_type,
+         self.current_turn, self.white_king_pos, self.black_king_pos,
+         self.pending_promotion) = undo
+
+        self.board[start_row][start_col] = piece
+        self.board[end_row][end_col] = captured
+        piece.row, piece.col = start_row, start_col
+        piece.has_moved = has_moved
+        piece.piece_type = piece_type
+        self.revision += 1
+
+    def get_all_valid_moves(self):
+        """All legal moves for the side to move as (start_row, start_col, end_row, end_col)"""
+        moves = []
+        for row in range(ROWS):
+            for col in range(COLS):
+                piece = self.board[row][col]
+                if piece and piece.color == self.current_turn:
+                    for end_row, end_col in self.get_valid_moves(row, col):
+                        moves.append((row, col, end_row, end_col))
+        return moves
+
+    def to_fen(self):
+        """Position in FEN notation (castling and en passant are not supported by Board)"""
+        rows = []
+        for row in range(ROWS):
+            text = ''
+            empty = 0
+            for col in range(COLS):
+                piece = self.board[row][col]
+                if piece is None:
+                    empty += 1
+                    continue
+                if empty:
+                    text += str(empty)
+                    empty = 0
+                text += piece.piece_type if piece.color == 'white' else piece.piece_type.lower()
+            if empty:
+                text += str(empty)
+            rows.append(text)
+        turn = 'w' if self.current_turn == 'white' else 'b'
+        return f"{'/'.join(rows)} {turn} - - 0 1"
+
+    @classmethod
+    def from_fen(cls, fen):
+        """Create a board directly from FEN without setting up the start position first"""
+        board = cls.__new__(cls)
+        board.set_fen(fen)
+        return board
+
+    def set_fen(self, fen):
+        """Load a position from FEN notation
+
+        Positions that cannot come up in a game are rejected: there must be
+        exactly one king per side, no pawns on the first or last rank, and
+        the side that just moved must not be left in check.
+        """
+        fields = fen.split()
+        rows = fields[0].split('/') if fields else []
+        if len(rows) != ROWS:
+            raise ValueError(f"Invalid FEN: {fen}")
+
+        board = [[None for _ in range(COLS)] for _ in range(ROWS)]
+        kings = {}
+        for row, text in enumerate(rows):
+            col = 0
+            for char in text:
+                if char.isdigit():
+                    col += int(char)
+                    continue
+                if col >= COLS or char.upper() not in 'KQRBNP':
+                    raise ValueError(f"Invalid FEN: {fen}")
+                color = 'white' if char.isupper() else 'black'
+                piece = Piece(color, char.upper(), row, col)
+                # Pawns off their starting rank and kings off e1/e8 have moved
+                if piece.piece_type == 'P':
+                    if row in (0, ROWS - 1):
+                        raise ValueError(f"Pawn on the first or last rank: {fen}")
+                    piece.has_moved = row != (6 if color == 'white' else 1)
+                elif piece.piece_type == 'K':
+                    if color in kings:
+                        raise ValueError(f"FEN must contain one king per side: {fen}")
+                    piece.has_moved = (row, col) != ((7, 4) if color == 'white' else (0, 4))
+                    kings[color] = (row, col)
+                board[row][col] = piece
+                col += 1
+            if col != COLS:
+                raise ValueError(f"Invalid FEN: {fen}")
+
+        if 'white' not in kings or 'black' not in kings:
+            raise ValueError(f"FEN must contain both kings: {fen}")
+
+        current_turn = 'black' if len(fields) > 1 and fields[1] == 'b' else 'white'
+        position = Board.__new__(Board)
+        position.board = board
+        position.white_king_pos, position.black_king_pos = kings['white'], kings['black']
+        if position.is_in_check('white' if current_turn == 'black' else 'black'):
+            raise ValueError(f"Side not to move is in check: {fen}")
+
+        self.board = board
+        self.current_turn = current_turn
+        self.white_king_pos = kings['white']
+        self.black_king_pos = kings['black']
+        self.selected_piece = None
+        self.valid_moves = []
+        self.pending_promotion = None
+        # from_fen boards start without one
+        self.revision = getattr(self, 'revision', 0) + 1
+
     def get_valid_moves(self, row, col):
         piece = self.get_piece(row, col)
         if not piece or piece.color != self.current_turn:
@@ -512,6 +699,17 @@ class Board:
                         return False
         return True
 
+    def get_status(self):
+        """'checkmate', 'stalemate', 'check' or 'normal' for the side to move"""
+        in_check = self.is_in_check(self.current_turn)
+        for row in range(ROWS):
+            for col in range(COLS):
+                piece = self.board[row][col]
+                if piece and piece.color == self.current_turn:
+                    if len(self.get_valid_moves(row, col)) > 0:
+                        return 'check' if in_check else 'normal'
+        return 'checkmate' if in_check else 'stalemate'
+
     def is_stalemate(self):
         if self.is_in_check(self.current_turn):
             return False
@@ -526,6 +724,256 @@ class Board:
         return True
 
 
+class SearchAborted(Exception):
+    """Raised inside Search when a stop request or a search limit is hit"""
+
+
+class Search:
+    """Iterative deepening alpha-beta search on a Board
+
+    The search plays and takes back moves on the given board, so the board is
+    back in its original position when run() returns. Pawns always promote to
+    queens. Once stop() is called every later run() returns immediately, use a
+    new Search for the next position. With a tablebase.Tablebase, positions it
+    covers are scored exactly instead of being searched. stop_event can be any
+    Event, e.g. a multiprocessing.Event shared with another process.
+    """
+
+    PIECE_VALUES = {'P': 100, 'N': 320, 'B': 330, 'R': 500, 'Q': 900, 'K': 0}
+    MATE_SCORE = 100000
+    MAX_DEPTH = 64
+
+    def __init__(self, board, tablebase=None, stop_event=None):
+        self.board = board
+        self.tablebase = tablebase
+        self.stop_event = stop_event or threading.Event()
+        self.nodes = 0
+        self.node_limit = None
+        self.deadline = None
+
+    def stop(self):
+        self.stop_event.set()
+
+    def evaluate(self):
+        """Static evaluation in centipawns from the side to move's point of view"""
+        score = 0
+        for row in range(ROWS):
+            for col in range(COLS):
+                piece = self.board.board[row][col]
+                if piece is None:
+                    continue
+                value = self.PIECE_VALUES[piece.piece_type]
+                if piece.piece_type == 'P':
+                    # Reward pawns for advancing
+                    value += 5 * (6 - row if piece.color == 'white' else row - 1)
+                elif piece.piece_type != 'K':
+                    # Reward pieces for staying near the centre
+                    value += int(4 * (3.5 - max(abs(row - 3.5), abs(col - 3.5))))
+                score += value if piece.color == 'white' else -value
+        return score if self.board.current_turn == 'white' else -score
+
+    def run(self, depth=None, movetime=None, nodes=None, on_info=None):
+        """Search the current position
+
+        depth is in plies, movetime in milliseconds, nodes a node budget. With no
+        limit the search runs until stop() is called or MAX_DEPTH is reached;
+        depth 0 returns the first legal move with the static evaluation.
+        on_info(depth, score, nodes, seconds, pv) is called after every completed
+        iteration. Returns (best_move, score, pv); best_move is None when the
+        side to move has no legal moves.
+        """
+        self.nodes = 0
+        self.node_limit = nodes
+        start = time.perf_counter()
+        self.deadline = start + movetime / 1000 if movetime else None
+
+        moves = self.board.get_all_valid_moves()
+        if not moves:
+            in_check = self.board.is_in_check(self.board.current_turn)
+            return None, -self.MATE_SCORE if in_check else 0, []
+
+        best_score, best_pv = self.evaluate(), [moves[0]]
+        for current_depth in range(1, (self.MAX_DEPTH if depth is None else depth) + 1):
+            try:
+                score, pv = self._negamax(current_depth, 0, -self.MATE_SCORE - 1,
+                                          self.MATE_SCORE + 1, best_pv)
+            except SearchAborted:
+                break
+            best_score, best_pv = score, pv
+            if on_info:
+                on_info(current_depth, score, self.nodes, time.perf_counter() - start, pv)
+            # No point in searching deeper once a forced mate is found
+            if abs(score) >= self.MATE_SCORE - self.MAX_DEPTH:
+                break
+
+        return best_pv[0], best_score, best_pv
+
+    def _check_limits(self):
+        if self.stop_event.is_set():
+            raise SearchAborted()
+        if self.node_limit and self.nodes >= self.node_limit:
+            raise SearchAborted()
+        if self.deadline and self.nodes % 64 == 0 and time.perf_counter() >= self.deadline:
+            raise SearchAborted()
+
+    def _order_moves(self, moves, first):
+        """Hint move first, then captures of the most valuable pieces"""
+        board = self.board.board
+
+        def key(move):
+            if move == first:
+                return -10000
+            target = board[move[2]][move[3]]
+            if target is None:
+                return 0
+            attacker = board[move[0]][move[1]]
+            return -self.PIECE_VALUES[target.piece_type] * 10 + self.PIECE_VALUES[attacker.piece_type] // 100
+
+        return sorted(moves, key=key)
+
+    def _negamax(self, depth, ply, alpha, beta, pv_hint):
+        self.nodes += 1
+        self._check_limits()
+
+        # The root is always searched so that there is a move to play
+        if self.tablebase and ply > 0:
+            result = self.tablebase.probe(self.board)
+            if result:
+                wdl, dtm = result
+                return wdl * (self.MATE_SCORE - ply - dtm) if wdl else 0, []
+
+        if depth == 0:
+            return self.evaluate(), []
+
+        board = self.board
+        moves = board.get_all_valid_moves()
+        if not moves:
+            if board.is_in_check(board.current_turn):
+                return -self.MATE_SCORE + ply, []
+            return 0, []
+
+        hint = pv_hint[0] if pv_hint else None
+        best_score, best_pv = -self.MATE_SCORE - 1, []
+        for move in self._order_moves(moves, hint):
+            undo = board.make_move(*move)
+            try:
+                child_hint = pv_hint[1:] if move == hint else None
+                score, child_pv = self._negamax(depth - 1, ply + 1, -beta, -alpha, child_hint)
+            finally:
+                board.undo_move(undo)
+            score = -score
+
+            if score > best_score:
+                best_score, best_pv = score, [move] + child_pv
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                break
+
+        return best_score, best_pv
+
+
+def _analyse(requests, results, generation, cancel_event, max_depth, instrumentation=None):
+    """AnalysisWorker process: search every FEN from requests until None arrives"""
+    # Results left unread when the game quits must not keep this process alive
+    results.cancel_join_thread()
+    if instrumentation:
+        start, collect, _ = instrumentation
+        start()
+    while True:
+        job = requests.get()
+        if job is None:
+            return
+        job_generation, fen = job
+        # Cleared before the generation check, so a submit() racing with us
+        # either makes us skip this job or stops the search below
+        cancel_event.clear()
+        # Skip positions that were replaced while waiting in the queue
+        if job_generation != generation.value:
+            continue
+
+        board = Board.from_fen(fen)
+        turn = board.current_turn
+        status = board.get_status()
+        results.put({'generation': job_generation, 'status': status})
+
+        def on_info(depth, score, nodes, seconds, pv):
+            results.put({
+                'generation': job_generation,
+                'depth': depth,
+                'score': score if turn == 'white' else -score,
+                'pv': pv,
+            })
+
+        if status not in ('checkmate', 'stalemate'):
+            Search(board, stop_event=cancel_event).run(depth=max_depth, on_info=on_info)
+        if instrumentation:
+            results.put({'generation': job_generation, 'stats': collect()})
+
+
+class AnalysisWorker:
+    """Analyses positions in a separate process so the UI loop never waits
+
+    A thread would share the GIL with the UI and stretch every frame while it
+    searches. submit() sends the position as FEN and cancels whatever is still
+    running. Results are dicts tagged with the generation returned by submit();
+    poll() returns them without blocking:
+        {'generation', 'status'}  status is 'checkmate', 'stalemate', 'check' or 'normal'
+        {'generation', 'depth', 'score', 'pv'}  score in centipawns for white
+    """
+
+    # (start, collect, merge) functions set by chess_profile.enable(): start()
+    # runs once in the analysis process, collect() after every position there,
+    # and merge() gets what collect() returned back in this process. Only
+    # workers created afterwards are instrumented.
+    instrumentation = None
+
+    def __init__(self, max_depth=4):
+        self.max_depth = max_depth
+        self.instrumentation = AnalysisWorker.instrumentation
+        self.requests = multiprocessing.Queue()
+        self.results = multiprocessing.Queue()
+        self.generation = multiprocessing.Value('q', 0, lock=False)
+        self.cancel_event = multiprocessing.Event()
+        self.process = multiprocessing.Process(
+            target=_analyse,
+            args=(self.requests, self.results, self.generation, self.cancel_event, max_depth,
+                  self.instrumentation),
+            daemon=True)
+        self.process.start()
+
+    def submit(self, board):
+        """Start analysing board, returns the generation its results will carry"""
+        self.cancel()
+        generation = self.generation.value
+        self.requests.put((generation, board.to_fen()))
+        return generation
+
+    def cancel(self):
+        """Stop the current analysis and drop anything still queued"""
+        self.generation.value += 1
+        self.cancel_event.set()
+
+    def poll(self):
+        results = []
+        while True:
+            try:
+                result = self.results.get_nowait()
+            except queue.Empty:
+                return results
+            if 'stats' in result:
+                self.instrumentation[2](result['stats'])
+            else:
+                results.append(result)
+
+    def close(self):
+        self.cancel()
+        self.requests.put(None)
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.terminate()
+
+
 class ChessGame:
     def __init__(self):
         self.screen = pygame.display.set_mode((WIDTH, HEIGHT))
@@ -535,6 +983,20 @@ class ChessGame:
         self.selected_square = None
         self.font = pygame.font.Font(None, 80)
         self.small_font = pygame.font.Font(None, 36)
+        self.tiny_font = pygame.font.Font(None, 24)
+        self.analysis_worker = AnalysisWorker()
+        self.start_analysis()
+
+    def start_analysis(self):
+        """Analyse the current position in the background, dropping the old results"""
+        self.analysis = {}
+        self.analysis_generation = self.analysis_worker.submit(self.board)
+
+    def update_analysis(self):
+        """Collect finished analysis results, called once per frame"""
+        for result in self.analysis_worker.poll():
+            if result['generation'] == self.analysis_generation:
+                self.analysis.update(result)
 
     def draw_board(self):
         for row in range(ROWS):
@@ -564,12 +1026,14 @@ class ChessGame:
     def draw_status(self):
         status_text = f"{self.board.current_turn.capitalize()}'s Turn"
 
-        if self.board.is_checkmate():
+        # Terminal state comes from the background analysis, never computed here
+        status = self.analysis.get('status')
+        if status == 'checkmate':
             winner = 'Black' if self.board.current_turn == 'white' else 'White'
             status_text = f"Checkmate! {winner} Wins!"
-        elif self.board.is_stalemate():
+        elif status == 'stalemate':
             status_text = "Stalemate! Draw!"
-        elif self.board.is_in_check(self.board.current_turn):
+        elif status == 'check':
             status_text += " (Check!)"
 
         text = self.small_font.render(status_text, True, (255, 255, 255))
@@ -620,6 +1084,32 @@ class ChessGame:
             self.screen.blit(name_text, (legend_x + 80, y_offset + 15))
             y_offset += 50
 
+    def draw_analysis(self):
+        """Show the latest evaluation and best line at the top of the legend panel"""
+        legend_x = BOARD_WIDTH
+        status = self.analysis.get('status')
+        if status in ('checkmate', 'stalemate'):
+            eval_text = "Eval: game over"
+        elif 'score' not in self.analysis:
+            eval_text = "Eval: analysing..."
+        else:
+            score = self.analysis['score']
+            if abs(score) >= Search.MATE_SCORE - Search.MAX_DEPTH:
+                mate_in = (Search.MATE_SCORE - abs(score) + 1) // 2
+                eval_text = f"Eval: {'' if score > 0 else '-'}M{mate_in}"
+            else:
+                eval_text = f"Eval: {score / 100:+.2f}"
+            eval_text += f"  (depth {self.analysis['depth']})"
+
+        text = self.tiny_font.render(eval_text, True, (255, 255, 255))
+        self.screen.blit(text, (legend_x + 20, 8))
+
+        pv = self.analysis.get('pv', [])[:4]
+        if pv:
+            line = ' '.join(square_name(m[0], m[1]) + square_name(m[2], m[3]) for m in pv)
+            text = self.tiny_font.render(f"Best: {line}", True, (200, 200, 200))
+            self.screen.blit(text, (legend_x + 20, 30))
+
     def draw_promotion_dialog(self):
         """Draw the pawn promotion selection dialog"""
         if not self.board.pending_promotion:
@@ -699,6 +1189,7 @@ class ChessGame:
                 button_y <= pos[1] <= button_y + button_height):
                 row, col = self.board.pending_promotion
                 self.board.promote_pawn(row, col, piece_type)
+                self.start_analysis()
                 return True
 
         return False
@@ -712,7 +1203,7 @@ class ChessGame:
         col = pos[0] // SQUARE_SIZE
         row = pos[1] // SQUARE_SIZE
 
-        if self.board.is_checkmate() or self.board.is_stalemate():
+        if self.analysis.get('status') in ('checkmate', 'stalemate'):
             return
 
         # If a piece is selected and clicking on valid move
@@ -721,6 +1212,12 @@ class ChessGame:
             self.board.move_piece(start_row, start_col, row, col)
             self.selected_square = None
             self.board.valid_moves = []
+            if self.board.pending_promotion:
+                # Nothing to analyse until the promotion piece is chosen
+                self.analysis_worker.cancel()
+                self.analysis = {}
+            else:
+                self.start_analysis()
         else:
             # Select a piece
             piece = self.board.get_piece(row, col)
@@ -731,10 +1228,20 @@ class ChessGame:
                 self.selected_square = None
                 self.board.valid_moves = []
 
+    def draw(self):
+        """Draw one frame"""
+        self.draw_board()
+        self.draw_pieces()
+        self.draw_status()
+        self.draw_legend()
+        self.draw_analysis()
+        self.draw_promotion_dialog()
+
     def run(self):
         running = True
         while running:
             self.clock.tick(60)
+            self.update_analysis()
 
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
@@ -742,14 +1249,10 @@ class ChessGame:
                 elif event.type == pygame.MOUSEBUTTONDOWN:
                     self.handle_click(pygame.mouse.get_pos())
 
-            self.draw_board()
-            self.draw_pieces()
-            self.draw_status()
-            self.draw_legend()
-            self.draw_promotion_dialog()
-
+            self.draw()
             pygame.display.flip()
 
+        self.analysis_worker.close()
         pygame.quit()
         sys.exit()
 
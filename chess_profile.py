@@ -0,0 +1,290 @@
+"""
+Hot path instrumentation
+Opt-in call counters and timings for the Board move generation and the
+ChessGame draw methods. Board work done in an AnalysisWorker process is
+counted there and merged in as the worker's results are polled. Per frame, both the interval between frames (which
+includes the clock.tick sleep) and the time spent in draw() plus
+pygame.display.flip() are kept. Nothing is wrapped until enable() is called, and
+disable() puts the original methods back, so instrumentation costs nothing
+while it is off.
+
+    import chess_profile
+    chess_profile.enable()
+    ...
+    chess_profile.dump_json('stats.json')
+
+Running this file starts the game with instrumentation and the on-screen
+overlay enabled, and writes the stats as JSON on exit:
+
+    python chess_profile.py --json stats.json
+"""
+
+import argparse
+import collections
+import functools
+import json
+import threading
+import time
+
+import pygame
+
+from chess import AnalysisWorker, Board, ChessGame
+
+# (class, method) pairs that are timed when instrumentation is enabled
+HOT_METHODS = [
+    (Board, 'get_valid_moves'),
+    (Board, '_would_be_in_check'),
+    (Board, 'is_in_check'),
+    (Board, 'is_checkmate'),
+    (Board, 'is_stalemate'),
+    (Board, 'get_status'),
+    (ChessGame, 'draw_board'),
+    (ChessGame, 'draw_pieces'),
+    (ChessGame, 'draw_status'),
+    (ChessGame, 'draw_legend'),
+    (ChessGame, 'draw_analysis'),
+    (ChessGame, 'draw_promotion_dialog'),
+]
+
+FRAME_WINDOW = 1000  # number of recent frames kept for percentiles
+
+_lock = threading.Lock()
+_originals = {}
+_stats = {}
+_frames = collections.deque(maxlen=FRAME_WINDOW)
+_renders = collections.deque(maxlen=FRAME_WINDOW)  # draw() start to the end of display.flip()
+_state = {'enabled_at': None, 'last_frame': None, 'draw_started': None, 'moves_generated': 0,
+          'overlay': False, 'font': None}
+
+
+def _name(cls, method):
+    return f"{cls.__name__}.{method}"
+
+
+def _timed(name, func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            with _lock:
+                stats = _stats[name]
+                stats[0] += 1
+                stats[1] += elapsed
+    return wrapper
+
+
+def _count_moves(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        moves = func(*args, **kwargs)
+        with _lock:
+            _state['moves_generated'] += len(moves)
+        return moves
+    return wrapper
+
+
+def _frame(func):
+    @functools.wraps(func)
+    def wrapper(game, *args, **kwargs):
+        now = time.perf_counter()
+        with _lock:
+            if _state['last_frame'] is not None:
+                _frames.append(now - _state['last_frame'])
+            _state['last_frame'] = now
+            _state['draw_started'] = now
+        func(game, *args, **kwargs)
+        if _state['overlay']:
+            draw_overlay(game.screen)
+    return wrapper
+
+
+def _flip(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        result = func(*args, **kwargs)
+        now = time.perf_counter()
+        with _lock:
+            if _state['draw_started'] is not None:
+                _renders.append(now - _state['draw_started'])
+                _state['draw_started'] = None
+        return result
+    return wrapper
+
+
+def is_enabled():
+    return bool(_originals)
+
+
+def enable(overlay=False):
+    """Wrap the hot methods with counters; overlay draws the stats on every frame
+
+    AnalysisWorkers created after this are instrumented as well.
+    """
+    _state['overlay'] = overlay
+    AnalysisWorker.instrumentation = (start_worker, collect_worker, merge_worker)
+    if _originals:
+        return
+    reset()
+    for cls, method in HOT_METHODS:
+        original = cls.__dict__[method]
+        _originals[cls, method] = original
+        wrapped = _timed(_name(cls, method), original)
+        if (cls, method) == (Board, 'get_valid_moves'):
+            wrapped = _count_moves(wrapped)
+        setattr(cls, method, wrapped)
+    _originals[ChessGame, 'draw'] = ChessGame.__dict__['draw']
+    ChessGame.draw = _frame(ChessGame.__dict__['draw'])
+    _originals[pygame.display, 'flip'] = pygame.display.flip
+    pygame.display.flip = _flip(pygame.display.flip)
+
+
+def disable():
+    """Restore the original methods; the collected stats are kept"""
+    for (cls, method), original in _originals.items():
+        setattr(cls, method, original)
+    _originals.clear()
+    _state['overlay'] = False
+    AnalysisWorker.instrumentation = None
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+        for cls, method in HOT_METHODS:
+            _stats[_name(cls, method)] = [0, 0.0]
+        _frames.clear()
+        _renders.clear()
+        _state['enabled_at'] = time.perf_counter()
+        _state['last_frame'] = None
+        _state['draw_started'] = None
+        _state['moves_generated'] = 0
+
+
+def start_worker():
+    """Instrument an AnalysisWorker process, counters inherited on fork are dropped"""
+    enable()
+    reset()
+
+
+def collect_worker():
+    """Counters of this process since the last call, which are then zeroed"""
+    with _lock:
+        functions = {name: list(values) for name, values in _stats.items() if values[0]}
+        moves = _state['moves_generated']
+        for values in _stats.values():
+            values[:] = [0, 0.0]
+        _state['moves_generated'] = 0
+    return {'functions': functions, 'moves_generated': moves}
+
+
+def merge_worker(stats):
+    """Add the counters collected in an AnalysisWorker process"""
+    with _lock:
+        for name, (calls, seconds) in stats['functions'].items():
+            values = _stats.setdefault(name, [0, 0.0])
+            values[0] += calls
+            values[1] += seconds
+        _state['moves_generated'] += stats['moves_generated']
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def _summary(values):
+    """Count and percentiles in ms of sorted durations in seconds"""
+    return {
+        'count': len(values),
+        'p50_ms': _percentile(values, 0.50) * 1000,
+        'p95_ms': _percentile(values, 0.95) * 1000,
+        'p99_ms': _percentile(values, 0.99) * 1000,
+        'max_ms': values[-1] * 1000 if values else 0.0,
+    }
+
+
+def report():
+    """Snapshot of the counters as a JSON serialisable dict"""
+    with _lock:
+        stats = {name: list(values) for name, values in _stats.items()}
+        frames = sorted(_frames)
+        renders = sorted(_renders)
+        moves = _state['moves_generated']
+        started = _state['enabled_at']
+    elapsed = time.perf_counter() - started if started else 0.0
+    movegen_seconds = stats.get(_name(Board, 'get_valid_moves'), [0, 0.0])[1]
+
+    return {
+        'elapsed_seconds': elapsed,
+        'functions': {
+            name: {
+                'calls': calls,
+                'total_ms': seconds * 1000,
+                'mean_us': seconds / calls * 1e6 if calls else 0.0,
+            }
+            for name, (calls, seconds) in stats.items()
+        },
+        'moves_generated': moves,
+        'moves_per_second': moves / elapsed if elapsed else 0.0,
+        'moves_per_movegen_second': moves / movegen_seconds if movegen_seconds else 0.0,
+        # Interval between frames, includes the clock.tick sleep
+        'frames': _summary(frames),
+        # Work per frame: draw() and pygame.display.flip()
+        'draw_flip': _summary(renders),
+    }
+
+
+def dump_json(path):
+    with open(path, 'w') as f:
+        json.dump(report(), f, indent=2)
+
+
+def draw_overlay(surface):
+    """Draw frame time percentiles and the most expensive functions"""
+    if _state['font'] is None:
+        _state['font'] = pygame.font.Font(None, 22)
+    font = _state['font']
+    data = report()
+    frames = data['frames']
+    renders = data['draw_flip']
+
+    lines = [
+        f"frame p50 {frames['p50_ms']:.1f}  p95 {frames['p95_ms']:.1f}  p99 {frames['p99_ms']:.1f} ms",
+        f"draw+flip p50 {renders['p50_ms']:.1f}  p95 {renders['p95_ms']:.1f}  p99 {renders['p99_ms']:.1f} ms",
+        f"moves/s {data['moves_per_second']:.0f}",
+    ]
+    busiest = sorted(data['functions'].items(), key=lambda item: item[1]['total_ms'], reverse=True)
+    for name, stats in busiest[:6]:
+        lines.append(f"{name.split('.')[1]}: {stats['calls']} calls, {stats['total_ms']:.0f} ms")
+
+    overlay = pygame.Surface((340, 8 + 18 * len(lines)))
+    overlay.set_alpha(200)
+    overlay.fill((0, 0, 0))
+    surface.blit(overlay, (10, 50))
+    for i, line in enumerate(lines):
+        text = font.render(line, True, (255, 255, 0))
+        surface.blit(text, (16, 54 + 18 * i))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the chess game with instrumentation")
+    parser.add_argument('--json', metavar='PATH', default='chess_profile.json',
+                        help="where to write the stats on exit")
+    parser.add_argument('--no-overlay', action='store_true', help="do not draw the stats on screen")
+    args = parser.parse_args(argv)
+
+    enable(overlay=not args.no_overlay)
+    game = ChessGame()
+    try:
+        game.run()
+    finally:
+        dump_json(args.json)
+        print(f"Wrote instrumentation stats to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
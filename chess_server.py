@@ -0,0 +1,403 @@
+"""
+Chess game server
+Host many Board sessions in one asyncio process for remote players. Clients
+talk JSON, one object per line, over TCP:
+
+    {"op": "new"}                                   -> {"ok": true, "game": "1", "fen": ...}
+    {"op": "state", "game": "1"}                    -> {"ok": true, "game": "1", "fen": ..., "status": ...}
+    {"op": "move", "game": "1", "move": "e2e4"}     -> same as state, and broadcast to subscribers
+    {"op": "subscribe", "game": "1"}                -> {"ok": true}, then {"event": "state", ...} per move
+    {"op": "unsubscribe", "game": "1"}              -> {"ok": true}
+
+An optional "id" in a request is echoed in its response. Errors come back as
+{"ok": false, "error": ...}. Sessions that are idle for a while are evicted to
+their FEN and restored the next time they are used. A client that stops
+reading is disconnected once too many broadcasts are waiting for it.
+
+    python chess_server.py serve --port 8765
+    python chess_server.py simulate --sessions 10000
+"""
+
+import os
+
+# The server is headless, keep pygame quiet and away from the display
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+import tracemalloc
+
+from chess import Board, START_FEN, parse_move, move_to_uci
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_IDLE_SECONDS = 60.0
+DEFAULT_MAX_BUFFER = 256 * 1024  # unsent bytes before a subscriber that stopped reading is dropped
+
+
+class Session:
+    """One game; board is None while the session is evicted to its FEN"""
+
+    __slots__ = ('game_id', 'board', 'fen', 'status', 'subscribers', 'last_active', 'plies')
+
+    def __init__(self, game_id, fen=START_FEN):
+        self.game_id = game_id
+        self.board = None
+        self.fen = fen
+        self.status = 'normal'
+        self.subscribers = set()
+        self.last_active = time.monotonic()
+        self.plies = 0
+
+    def get_board(self):
+        """Return the live board, restoring it from the FEN when evicted"""
+        if self.board is None:
+            self.board = Board.from_fen(self.fen)
+            self.fen = None
+        self.last_active = time.monotonic()
+        return self.board
+
+    def evict(self):
+        if self.board is not None:
+            self.fen = self.board.to_fen()
+            self.board = None
+
+    def state(self):
+        return {
+            'game': self.game_id,
+            'fen': self.fen if self.board is None else self.board.to_fen(),
+            'status': self.status,
+            'plies': self.plies,
+        }
+
+
+class Connection:
+    """A client connection; also what sessions keep as subscribers"""
+
+    def __init__(self, writer, max_buffer=DEFAULT_MAX_BUFFER):
+        self.writer = writer
+        self.max_buffer = max_buffer
+        self.subscriptions = set()
+
+    def send(self, message):
+        """Queue message for the client, returns False once the connection is gone
+
+        Broadcasts are written without waiting for the client, so a client that
+        stops reading would make the transport buffer grow without limit. Once
+        more than max_buffer bytes are waiting the connection is aborted.
+        """
+        if self.writer.is_closing():
+            return False
+        if self.writer.transport.get_write_buffer_size() > self.max_buffer:
+            self.writer.transport.abort()
+            return False
+        self.writer.write(json.dumps(message, separators=(',', ':')).encode() + b'\n')
+        return True
+
+
+class GameServer:
+    def __init__(self, idle_seconds=DEFAULT_IDLE_SECONDS, max_buffer=DEFAULT_MAX_BUFFER):
+        self.idle_seconds = idle_seconds
+        self.max_buffer = max_buffer
+        self.sessions = {}
+        self.ids = itertools.count(1)
+        self.stats = {'moves': 0, 'move_seconds': 0.0, 'evictions': 0, 'restores': 0, 'dropped': 0}
+
+    def create_session(self, fen=START_FEN):
+        session = Session(str(next(self.ids)), fen)
+        self.sessions[session.game_id] = session
+        return session
+
+    def evict_idle(self, now=None):
+        """Evict every live session idle for longer than idle_seconds"""
+        cutoff = (now or time.monotonic()) - self.idle_seconds
+        evicted = 0
+        for session in self.sessions.values():
+            if session.board is not None and session.last_active < cutoff:
+                session.evict()
+                evicted += 1
+        self.stats['evictions'] += evicted
+        return evicted
+
+    async def evict_idle_forever(self):
+        while True:
+            await asyncio.sleep(max(self.idle_seconds / 2, 0.1))
+            self.evict_idle()
+
+    def dispatch(self, request, connection=None):
+        """Handle one decoded request and return the response"""
+        try:
+            response = self._dispatch(request, connection)
+        except Exception as e:
+            # One bad request must not take the connection (or the server) down
+            response = {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+        if isinstance(request, dict) and 'id' in request:
+            response['id'] = request['id']
+        return response
+
+    def _dispatch(self, request, connection):
+        if not isinstance(request, dict):
+            return {'ok': False, 'error': 'request must be a JSON object'}
+        op = request.get('op')
+        for field in ('fen', 'move'):
+            if field in request and not isinstance(request[field], str):
+                return {'ok': False, 'error': f"{field} must be a string"}
+        if 'game' in request and not isinstance(request['game'], (str, int)):
+            return {'ok': False, 'error': 'game must be a string or an integer'}
+
+        if op == 'new':
+            fen = request.get('fen') or START_FEN
+            try:
+                board = Board.from_fen(fen)
+            except ValueError as e:
+                return {'ok': False, 'error': str(e)}
+            # New sessions start out evicted, the board is built on the first move
+            session = self.create_session(board.to_fen())
+            session.status = board.get_status()
+            return {'ok': True, **session.state()}
+
+        session = self.sessions.get(str(request.get('game')))
+        if session is None:
+            return {'ok': False, 'error': f"unknown game {request.get('game')}"}
+
+        if op == 'state':
+            session.last_active = time.monotonic()
+            return {'ok': True, **session.state()}
+        if op == 'move':
+            return self._move(session, request.get('move', ''))
+        if op == 'subscribe':
+            if connection is None:
+                return {'ok': False, 'error': 'subscribe needs a connection'}
+            session.subscribers.add(connection)
+            connection.subscriptions.add(session.game_id)
+            return {'ok': True, 'game': session.game_id}
+        if op == 'unsubscribe':
+            session.subscribers.discard(connection)
+            if connection is not None:
+                connection.subscriptions.discard(session.game_id)
+            return {'ok': True, 'game': session.game_id}
+        return {'ok': False, 'error': f"unknown op {op}"}
+
+    def _move(self, session, text):
+        start = time.perf_counter()
+        if session.status in ('checkmate', 'stalemate'):
+            return {'ok': False, 'error': 'game is over', **session.state()}
+        try:
+            start_row, start_col, end_row, end_col, promotion = parse_move(text)
+        except ValueError as e:
+            return {'ok': False, 'error': str(e)}
+
+        if session.board is None:
+            self.stats['restores'] += 1
+        board = session.get_board()
+        if (end_row, end_col) not in board.get_valid_moves(start_row, start_col):
+            return {'ok': False, 'error': f"illegal move {text}"}
+
+        board.make_move(start_row, start_col, end_row, end_col, promotion or 'Q')
+        session.status = board.get_status()
+        session.plies += 1
+        state = session.state()
+        state['last_move'] = text
+
+        self.stats['moves'] += 1
+        self.stats['move_seconds'] += time.perf_counter() - start
+
+        if session.subscribers:
+            event = {'event': 'state', **state}
+            for subscriber in list(session.subscribers):
+                if not subscriber.send(event):
+                    session.subscribers.discard(subscriber)
+                    self.stats['dropped'] += 1
+        return {'ok': True, **state}
+
+    async def handle_client(self, reader, writer):
+        connection = Connection(writer, self.max_buffer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    response = {'ok': False, 'error': 'invalid JSON'}
+                else:
+                    response = self.dispatch(request, connection)
+                connection.send(response)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            for game_id in connection.subscriptions:
+                session = self.sessions.get(game_id)
+                if session:
+                    session.subscribers.discard(connection)
+            writer.close()
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        server = await asyncio.start_server(self.handle_client, host, port)
+        evictor = asyncio.ensure_future(self.evict_idle_forever())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            evictor.cancel()
+
+
+class SimulatedClient:
+    """Plays random legal moves in its games over one connection"""
+
+    def __init__(self, reader, writer, seed):
+        self.reader = reader
+        self.writer = writer
+        self.rng = random.Random(seed)
+        self.ids = itertools.count(1)
+        self.pending = {}
+        self.boards = {}  # game id -> local Board used to pick legal moves
+        self.moves = 0
+        self.listener = asyncio.ensure_future(self._listen())
+
+    async def _listen(self):
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                return
+            message = json.loads(line)
+            future = self.pending.pop(message.get('id'), None)
+            if future is not None:
+                future.set_result(message)
+
+    async def request(self, message):
+        message['id'] = next(self.ids)
+        future = asyncio.get_running_loop().create_future()
+        self.pending[message['id']] = future
+        self.writer.write(json.dumps(message).encode() + b'\n')
+        await self.writer.drain()
+        return await future
+
+    async def new_game(self):
+        response = await self.request({'op': 'new'})
+        self.boards[response['game']] = Board()
+        return response['game']
+
+    async def play_round(self, max_plies):
+        """Play one random move in every game, restarting finished games"""
+        for game_id in list(self.boards):
+            board = self.boards[game_id]
+            moves = board.get_all_valid_moves()
+            if not moves or board.pending_promotion:
+                continue
+            move = self.rng.choice(moves)
+            text = move_to_uci(board, move)
+            response = await self.request({'op': 'move', 'game': game_id, 'move': text})
+            if not response['ok']:
+                raise RuntimeError(f"server rejected {text} in game {game_id}: {response['error']}")
+            board.make_move(*move)
+            self.moves += 1
+            if response['status'] in ('checkmate', 'stalemate') or response['plies'] >= max_plies:
+                del self.boards[game_id]
+                await self.new_game()
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+        await self.listener
+
+
+def measure_session_memory(count):
+    """Bytes per session while live and while evicted, measured with tracemalloc"""
+    server = GameServer()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        for _ in range(count):
+            server.create_session().get_board()
+        live = tracemalloc.get_traced_memory()[0]
+        for session in server.sessions.values():
+            session.evict()
+        evicted = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return (live - before) / count, (evicted - before) / count
+
+
+async def simulate(sessions, clients, rounds, max_plies, idle_seconds, seed):
+    live_bytes, evicted_bytes = measure_session_memory(sessions)
+    print(f"memory per session: {live_bytes / 1024:.1f} KB live, "
+          f"{evicted_bytes:.0f} B evicted")
+
+    server = GameServer(idle_seconds=idle_seconds)
+    listener = await asyncio.start_server(server.handle_client, DEFAULT_HOST, 0)
+    port = listener.sockets[0].getsockname()[1]
+    evictor = asyncio.ensure_future(server.evict_idle_forever())
+
+    players = []
+    for i in range(clients):
+        reader, writer = await asyncio.open_connection(DEFAULT_HOST, port)
+        players.append(SimulatedClient(reader, writer, seed + i))
+
+    start = time.perf_counter()
+    per_client = [sessions // clients + (1 if i < sessions % clients else 0) for i in range(clients)]
+    await asyncio.gather(*(
+        asyncio.gather(*(player.new_game() for _ in range(count)))
+        for player, count in zip(players, per_client)))
+    print(f"created {len(server.sessions)} sessions in {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    for round_number in range(rounds):
+        await asyncio.gather(*(player.play_round(max_plies) for player in players))
+    elapsed = time.perf_counter() - start
+
+    moves = sum(player.moves for player in players)
+    print(f"played {moves} moves in {elapsed:.2f}s: {moves / elapsed:.0f} moves/s end to end "
+          f"(clients pick moves in the same process)")
+    if server.stats['move_seconds']:
+        print(f"server move handling: {server.stats['moves'] / server.stats['move_seconds']:.0f} moves/s")
+    print(f"evictions: {server.stats['evictions']}, restores: {server.stats['restores']}")
+
+    for player in players:
+        await player.close()
+    evictor.cancel()
+    listener.close()
+    await listener.wait_closed()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Multi-session chess game server")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = commands.add_parser('serve', help="run the server")
+    serve_parser.add_argument('--host', default=DEFAULT_HOST)
+    serve_parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    serve_parser.add_argument('--idle', type=float, default=DEFAULT_IDLE_SECONDS,
+                              help="seconds before an idle session is evicted")
+    serve_parser.add_argument('--max-buffer', type=int, default=DEFAULT_MAX_BUFFER,
+                              help="unsent bytes before a client that stopped reading is dropped")
+
+    sim_parser = commands.add_parser('simulate', help="measure a local server under load")
+    sim_parser.add_argument('--sessions', type=int, default=10000)
+    sim_parser.add_argument('--clients', type=int, default=50)
+    sim_parser.add_argument('--rounds', type=int, default=5,
+                            help="moves played per session")
+    sim_parser.add_argument('--max-plies', type=int, default=200,
+                            help="restart a game after this many plies")
+    sim_parser.add_argument('--idle', type=float, default=2.0,
+                            help="seconds before an idle session is evicted")
+    sim_parser.add_argument('--seed', type=int, default=0)
+
+    args = parser.parse_args(argv)
+    if args.command == 'serve':
+        asyncio.run(GameServer(idle_seconds=args.idle, max_buffer=args.max_buffer).serve(args.host, args.port))
+    else:
+        asyncio.run(simulate(args.sessions, args.clients, args.rounds, args.max_plies,
+                             args.idle, args.seed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+"""
+Tournament view
+Show many live games in one window as a grid of small boards. All boards
+share one sprite atlas from PieceRenderer, a board is only redrawn when its
+position changed, and at most once per min_interval seconds, and only the
+redrawn tiles are pushed to the display. A tile compares the board's
+revision counter, which Board bumps on every move, with the one it last drew,
+so boards moved anywhere (a feed, a server session) are picked up without
+being told, and the game status is only computed once per new position.
+
+    python chess_tournament.py --boards 32
+"""
+
+import argparse
+import math
+import random
+import sys
+import time
+
+import pygame
+
+from chess import Board, PieceRenderer, WHITE, BLACK, ROWS, COLS
+
+BACKGROUND = (30, 30, 30)
+LABEL_HEIGHT = 20
+PADDING = 8
+
+
+def grid_layout(count, width, height):
+    """(columns, rows, square_size) giving the largest squares for count boards"""
+    best = (1, count, 1)
+    for columns in range(1, count + 1):
+        rows = math.ceil(count / columns)
+        tile_width = (width - PADDING * (columns + 1)) // columns
+        tile_height = (height - PADDING * (rows + 1)) // rows - LABEL_HEIGHT
+        square_size = min(tile_width, tile_height) // COLS
+        if square_size > best[2]:
+            best = (columns, rows, square_size)
+    return best
+
+
+class BoardTile:
+    """One board of the grid with its own cached surface"""
+
+    def __init__(self, board, name, rect, square_size):
+        self.board = board
+        self.name = name
+        self.rect = rect
+        self.square_size = square_size
+        self.surface = pygame.Surface(rect.size)
+        self.status = None
+        self.drawn = None  # (board, revision) of the last render
+        self.drawn_at = float('-inf')
+
+    def position(self):
+        """The board and its revision: differs whenever the shown position changed
+
+        The board itself is part of it, so assigning a new Board to tile.board
+        (a restarted game) is noticed as well.
+        """
+        return self.board, self.board.revision
+
+    def needs_redraw(self, now, min_interval):
+        if now - self.drawn_at < min_interval:
+            return False
+        return self.position() != self.drawn
+
+    def render(self, atlas, font, now):
+        position = self.position()
+        if position != self.drawn:
+            self.status = self.board.get_status()
+        self.drawn = position
+        self.drawn_at = now
+        surface = self.surface
+        size = self.square_size
+        surface.fill(BACKGROUND)
+
+        status = self.status
+        if status == 'checkmate':
+            winner = 'Black' if self.board.current_turn == 'white' else 'White'
+            label = f"{self.name}: {winner} wins"
+        elif status == 'stalemate':
+            label = f"{self.name}: draw"
+        else:
+            label = f"{self.name}: {self.board.current_turn}" + (" (check)" if status == 'check' else "")
+        surface.blit(font.render(label, True, (255, 255, 255)), (2, 2))
+
+        for row in range(ROWS):
+            for col in range(COLS):
+                x = col * size
+                y = LABEL_HEIGHT + row * size
+                color = WHITE if (row + col) % 2 == 0 else BLACK
+                pygame.draw.rect(surface, color, (x, y, size, size))
+                piece = self.board.get_piece(row, col)
+                if piece:
+                    surface.blit(atlas[piece.piece_type, piece.color], (x, y))
+
+
+class TournamentView:
+    def __init__(self, screen, boards, names=None, min_interval=0.25):
+        self.screen = screen
+        self.min_interval = min_interval
+        self.font = pygame.font.Font(None, 20)
+
+        width, height = screen.get_size()
+        columns, rows, square_size = grid_layout(len(boards), width, height)
+        self.atlas = PieceRenderer.get_atlas(square_size)
+
+        names = names or [f"Board {i + 1}" for i in range(len(boards))]
+        self.tiles = []
+        for i, (board, name) in enumerate(zip(boards, names)):
+            column, row = i % columns, i // columns
+            x = PADDING + column * (square_size * COLS + PADDING)
+            y = PADDING + row * (square_size * ROWS + LABEL_HEIGHT + PADDING)
+            rect = pygame.Rect(x, y, square_size * COLS, square_size * ROWS + LABEL_HEIGHT)
+            self.tiles.append(BoardTile(board, name, rect, square_size))
+        self.full_redraw = True
+
+    def update(self, now=None):
+        """Redraw the boards that changed, returns the screen rects to update"""
+        now = time.perf_counter() if now is None else now
+        if self.full_redraw:
+            self.screen.fill(BACKGROUND)
+
+        dirty = []
+        for tile in self.tiles:
+            if self.full_redraw or tile.needs_redraw(now, self.min_interval):
+                tile.render(self.atlas, self.font, now)
+                self.screen.blit(tile.surface, tile.rect)
+                dirty.append(tile.rect)
+
+        if self.full_redraw:
+            self.full_redraw = False
+            return [self.screen.get_rect()]
+        return dirty
+
+
+def play_random_move(board, rng):
+    """Play a random legal move, returns False when the game is over"""
+    moves = board.get_all_valid_moves()
+    if not moves:
+        return False
+    board.make_move(*rng.choice(moves))
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Grid view of many live games")
+    parser.add_argument('--boards', type=int, default=16)
+    parser.add_argument('--width', type=int, default=1600)
+    parser.add_argument('--height', type=int, default=900)
+    parser.add_argument('--interval', type=float, default=0.25,
+                        help="minimum seconds between redraws of one board")
+    parser.add_argument('--move-delay', type=float, default=1.0,
+                        help="average seconds between moves in each simulated game")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    screen = pygame.display.set_mode((args.width, args.height))
+    pygame.display.set_caption("Chess Tournament")
+    clock = pygame.time.Clock()
+    rng = random.Random(args.seed)
+
+    # Random games stand in for a live feed
+    boards = [Board() for _ in range(args.boards)]
+    next_move = [rng.uniform(0, args.move_delay * 2) for _ in boards]
+    view = TournamentView(screen, boards, min_interval=args.interval)
+
+    start = time.perf_counter()
+    running = True
+    while running:
+        clock.tick(30)
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+
+        now = time.perf_counter()
+        for i, board in enumerate(boards):
+            if now - start >= next_move[i]:
+                if not play_random_move(board, rng):
+                    boards[i] = view.tiles[i].board = Board()
+                next_move[i] = now - start + rng.uniform(0, args.move_delay * 2)
+
+        dirty = view.update(now)
+        if dirty:
+            pygame.display.update(dirty)
+
+    pygame.quit()
+    sys.exit()
+
+
+if __name__ == "__main__":
+    main()
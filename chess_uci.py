@@ -0,0 +1,274 @@
+"""
+UCI engine mode
+Drive chess.Board headlessly over the UCI protocol on stdin/stdout so that
+tournament managers and analysis GUIs can play against it:
+
+    python chess_uci.py
+
+Supported commands: uci, isready, ucinewgame, setoption (TablebasePath, a
+directory of tables made by tablebase.py), position (startpos or fen, with
+an optional move list), go (depth, movetime, nodes, wtime/btime/winc/binc,
+movestogo, infinite), stop and quit. One Board is kept for the whole session;
+a position command that extends (or takes back part of) the previous move
+list only plays or undoes the difference.
+
+Board has no castling or en passant, so those moves are rejected. Rather
+than search a position the GUI does not have, the engine then reports an
+"info string error" and answers go with "bestmove 0000" until a valid
+position is set.
+"""
+
+import os
+
+# pygame prints a banner and opens subsystems on import, keep stdout clean for UCI
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import sys
+import threading
+
+from chess import Board, Search, START_FEN, parse_move, move_to_uci
+from tablebase import Tablebase
+
+ENGINE_NAME = 'sidethings chess'
+ENGINE_AUTHOR = 'mazenh0'
+
+
+def pv_to_uci(board, pv):
+    """Format a principal variation, playing it on board to get promotions right"""
+    texts = []
+    undos = []
+    for move in pv:
+        texts.append(move_to_uci(board, move))
+        undos.append(board.make_move(*move))
+    for undo in reversed(undos):
+        board.undo_move(undo)
+    return texts
+
+
+def unsupported_move(board, text):
+    """Explain a rejected move that would be legal with castling or en passant"""
+    start_row, start_col, end_row, end_col, _ = parse_move(text)
+    piece = board.get_piece(start_row, start_col)
+    if piece is None:
+        return ''
+    if piece.piece_type == 'K' and start_row == end_row and abs(end_col - start_col) == 2:
+        return ' (castling is not supported)'
+    if (piece.piece_type == 'P' and start_col != end_col
+            and board.get_piece(end_row, end_col) is None):
+        return ' (en passant is not supported)'
+    return ''
+
+
+def score_to_uci(score):
+    if abs(score) >= Search.MATE_SCORE - Search.MAX_DEPTH:
+        plies = Search.MATE_SCORE - abs(score)
+        moves = (plies + 1) // 2
+        return f"mate {moves if score > 0 else -moves}"
+    return f"cp {score}"
+
+
+class UCIEngine:
+    def __init__(self, output=None):
+        self.output = output or sys.stdout
+        self.output_lock = threading.Lock()
+        self.board = Board()
+        self.search = None
+        self.search_thread = None
+        self.tablebase = None
+        self.base = 'startpos'
+        self.moves = []  # UCI moves played since self.base
+        self.undo_stack = []  # make_move undo info, one per entry in self.moves
+        self.position_error = None  # why the last position command failed, go refuses to search
+        self.infinite = False
+
+    def send(self, line):
+        with self.output_lock:
+            self.output.write(line + '\n')
+            self.output.flush()
+
+    def handle(self, line):
+        """Handle one command line, returns False when the engine should exit"""
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, args = tokens[0], tokens[1:]
+
+        if command == 'uci':
+            self.send(f"id name {ENGINE_NAME}")
+            self.send(f"id author {ENGINE_AUTHOR}")
+            self.send("option name TablebasePath type string default <empty>")
+            self.send("uciok")
+        elif command == 'isready':
+            self.send("readyok")
+        elif command == 'setoption':
+            self.stop_search()
+            self.cmd_setoption(args)
+        elif command == 'ucinewgame':
+            self.stop_search()
+            self.set_position('startpos', [])
+        elif command == 'position':
+            self.stop_search()
+            self.cmd_position(args)
+        elif command == 'go':
+            self.stop_search()
+            self.cmd_go(args)
+        elif command == 'stop':
+            self.stop_search()
+        elif command == 'quit':
+            self.stop_search()
+            return False
+        else:
+            self.send(f"info string unknown command {command}")
+        return True
+
+    def cmd_setoption(self, args):
+        if 'name' not in args:
+            return
+        if 'value' in args:
+            name = ' '.join(args[args.index('name') + 1:args.index('value')])
+            value = ' '.join(args[args.index('value') + 1:])
+        else:
+            name, value = ' '.join(args[args.index('name') + 1:]), ''
+
+        if name.lower() == 'tablebasepath':
+            if self.tablebase:
+                self.tablebase.close()
+                self.tablebase = None
+            if not value or value == '<empty>':
+                return
+            try:
+                self.tablebase = Tablebase(value)
+            except OSError as e:
+                self.send(f"info string error {e}")
+                return
+            if not self.tablebase.signatures:
+                self.send(f"info string error no tables found in {value}")
+            else:
+                self.send(f"info string tablebases {' '.join(self.tablebase.signatures)}")
+        else:
+            self.send(f"info string unknown option {name}")
+
+    def cmd_position(self, args):
+        if 'moves' in args:
+            index = args.index('moves')
+            spec, moves = args[:index], args[index + 1:]
+        else:
+            spec, moves = args, []
+
+        if spec and spec[0] == 'startpos':
+            base = 'startpos'
+        elif spec and spec[0] == 'fen':
+            base = ' '.join(spec[1:])
+        else:
+            self.fail_position("position needs startpos or fen")
+            return
+        self.set_position(base, moves)
+
+    def fail_position(self, reason):
+        self.position_error = reason
+        self.send(f"info string error {reason}")
+
+    def set_position(self, base, moves):
+        """Bring the board to base + moves, reusing the moves already on the board"""
+        self.position_error = None
+        if base != self.base:
+            try:
+                self.board.set_fen(START_FEN if base == 'startpos' else base)
+            except ValueError as e:
+                # The board is left as it was, which is no longer the position asked for
+                self.base = None
+                self.fail_position(str(e))
+                return
+            self.base = base
+            self.moves = []
+            self.undo_stack = []
+
+        common = 0
+        while (common < len(self.moves) and common < len(moves)
+               and self.moves[common] == moves[common]):
+            common += 1
+
+        while len(self.moves) > common:
+            self.board.undo_move(self.undo_stack.pop())
+            self.moves.pop()
+
+        for text in moves[common:]:
+            try:
+                start_row, start_col, end_row, end_col, promotion = parse_move(text)
+            except ValueError as e:
+                self.fail_position(str(e))
+                return
+            if (end_row, end_col) not in self.board.get_valid_moves(start_row, start_col):
+                self.fail_position(f"illegal move {text}{unsupported_move(self.board, text)}")
+                return
+            self.undo_stack.append(self.board.make_move(start_row, start_col, end_row, end_col,
+                                                        promotion or 'Q'))
+            self.moves.append(text)
+
+    def cmd_go(self, args):
+        if self.position_error:
+            # Every go needs a bestmove, answer as if there were no legal moves
+            self.send(f"info string error not searching, {self.position_error}")
+            self.send("bestmove 0000")
+            return
+
+        limits = {}
+        i = 0
+        while i < len(args):
+            if args[i] == 'infinite':
+                limits['infinite'] = True
+                i += 1
+            elif i + 1 < len(args) and args[i + 1].lstrip('-').isdigit():
+                limits[args[i]] = int(args[i + 1])
+                i += 2
+            else:
+                i += 1
+
+        movetime = limits.get('movetime')
+        if movetime is None and not limits.get('infinite'):
+            remaining = limits.get('wtime' if self.board.current_turn == 'white' else 'btime')
+            increment = limits.get('winc' if self.board.current_turn == 'white' else 'binc', 0)
+            if remaining is not None:
+                # Spread the clock over the remaining moves, keep a safety margin
+                moves_to_go = limits.get('movestogo', 30)
+                movetime = max(1, min(remaining // 2, remaining // max(moves_to_go, 1) + increment // 2))
+
+        self.infinite = bool(limits.get('infinite'))
+        self.search = Search(self.board, self.tablebase)
+        self.search_thread = threading.Thread(
+            target=self._search,
+            args=(limits.get('depth'), movetime, limits.get('nodes')),
+            daemon=True)
+        self.search_thread.start()
+
+    def _search(self, depth, movetime, nodes):
+        move, score, pv = self.search.run(depth=depth, movetime=movetime, nodes=nodes,
+                                          on_info=self._send_info)
+        if self.infinite:
+            # go infinite must not answer before stop, even when a mate was found
+            self.search.stop_event.wait()
+        self.send(f"bestmove {move_to_uci(self.board, move) if move else '0000'}")
+
+    def _send_info(self, depth, score, nodes, seconds, pv):
+        millis = int(seconds * 1000)
+        nps = int(nodes / seconds) if seconds > 0 else 0
+        self.send(f"info depth {depth} score {score_to_uci(score)} nodes {nodes} "
+                  f"nps {nps} time {millis} pv {' '.join(pv_to_uci(self.board, pv))}")
+
+    def stop_search(self):
+        if self.search_thread:
+            self.search.stop()
+            self.search_thread.join()
+            self.search_thread = None
+
+    def loop(self, stream=None):
+        for line in stream or sys.stdin:
+            if not self.handle(line):
+                break
+        self.stop_search()
+
+
+if __name__ == "__main__":
+    UCIEngine().loop()
@@ -0,0 +1,711 @@
+"""
+Endgame tablebases
+Generate perfect-play tables for small endings (KQvK, KRvK, KPvK and up to
+four pieces in total) by retrograde analysis, and probe them through mmap.
+
+Each table stores one byte per position: 0 for a draw, 255 for an illegal
+position, otherwise the distance to mate in plies plus one. An odd distance
+means the side to move wins, an even one that it gets mated. Squares are
+row * 8 + col as in chess.Board and the pieces are ordered as in the table
+name (white pieces first, so the white king comes first). Only the stronger
+side is stored as white, probes of the mirrored ending are flipped on the
+fly.
+
+Positions that are mirror images of each other are stored once. The board
+is turned so that the white king lands in a fundamental domain: the a1-d1-d4
+triangle in pawnless endings (all 8 symmetries of the board), files a-d when
+there are pawns (left-right mirror only). A position is then addressed by
+index = side * half + slot + slots * sum(square_i * 64**(i - 1)), where slot
+is the white king's place in the domain and the sum runs over the other
+pieces. With the king on the a1-h8 diagonal both reflections stay in the
+triangle; the one with the lower index is used and the other is stored as
+illegal. This makes a pawnless table 6.4 times and a pawn table 2 times
+smaller than one byte for every square of every piece.
+
+The rules follow chess.Board: no castling, no en passant, pawns promote to
+Q, R, B or N, and the fifty-move rule is not applied.
+
+    python tablebase.py generate --dir tables
+    python tablebase.py generate --dir tables --pieces 4 --processes 8
+    python tablebase.py probe --dir tables "8/8/8/4k3/8/8/8/4KQ2 w - - 0 1"
+"""
+
+import argparse
+import itertools
+import mmap
+import multiprocessing
+import os
+import struct
+import sys
+import time
+from array import array
+
+MAGIC = b'CTB2'
+HEADER = struct.Struct('<4s12sB3x')
+EXTENSION = '.ctb'
+
+DRAW = 0
+ILLEGAL = 255
+MAX_DTM = 253
+
+PIECE_ORDER = 'KQRBNP'
+PIECE_VALUES = {'K': 0, 'Q': 9, 'R': 5, 'B': 3, 'N': 3, 'P': 1}
+PROMOTIONS = 'QRBN'
+
+# Endings that cannot be won by either side, no table is needed
+DRAWN_SIGNATURES = {'KvK', 'KBvK', 'KNvK'}
+
+DEFAULT_TABLES = ['KQvK', 'KRvK', 'KPvK']
+
+WHITE, BLACK = 0, 1
+
+# Position states computed in the first generation pass
+UNKNOWN, MATE, STALEMATE, INVALID = 0, 1, 2, 3
+
+
+def _row(square):
+    return square // 8
+
+
+def _col(square):
+    return square % 8
+
+
+def _on_board(row, col):
+    return 0 <= row < 8 and 0 <= col < 8
+
+
+def _targets(offsets):
+    table = []
+    for square in range(64):
+        row, col = _row(square), _col(square)
+        table.append([(row + dr) * 8 + col + dc for dr, dc in offsets if _on_board(row + dr, col + dc)])
+    return table
+
+
+KING_TARGETS = _targets([(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)])
+KNIGHT_TARGETS = _targets([(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)])
+# White pawns move towards row 0, black pawns towards row 7
+PAWN_ATTACKS = [_targets([(-1, -1), (-1, 1)]), _targets([(1, -1), (1, 1)])]
+PAWN_STEP = [-8, 8]
+PAWN_START_ROW = [6, 1]
+PAWN_DOUBLE_ROW = [4, 3]
+PROMOTION_ROW = [0, 7]
+
+ROOK_DIRECTIONS = [(0, 1), (0, -1), (1, 0), (-1, 0)]
+BISHOP_DIRECTIONS = [(1, 1), (1, -1), (-1, 1), (-1, -1)]
+
+
+def _rays(directions):
+    table = []
+    for square in range(64):
+        rays = []
+        for dr, dc in directions:
+            ray = []
+            row, col = _row(square) + dr, _col(square) + dc
+            while _on_board(row, col):
+                ray.append(row * 8 + col)
+                row, col = row + dr, col + dc
+            rays.append(ray)
+        table.append(rays)
+    return table
+
+
+ROOK_RAYS = _rays(ROOK_DIRECTIONS)
+BISHOP_RAYS = _rays(BISHOP_DIRECTIONS)
+SLIDER_RAYS = {'R': ROOK_RAYS, 'B': BISHOP_RAYS}
+
+
+def _lines():
+    """LINES[a][b] = ('R' or 'B', squares strictly between) when a and b share a line"""
+    table = [[None] * 64 for _ in range(64)]
+    for kind, rays in SLIDER_RAYS.items():
+        for square in range(64):
+            for ray in rays[square]:
+                for i, target in enumerate(ray):
+                    table[square][target] = (kind, ray[:i])
+    return table
+
+
+LINES = _lines()
+
+
+def _symmetry(flip_file, flip_rank, transpose):
+    table = []
+    for square in range(64):
+        row, col = _row(square), _col(square)
+        if transpose:
+            row, col = col, row
+        if flip_file:
+            col = 7 - col
+        if flip_rank:
+            row = 7 - row
+        table.append(row * 8 + col)
+    return table
+
+
+# Identity first, so positions already in the domain are left alone
+SYMMETRIES = [_symmetry(*flags) for flags in itertools.product((False, True), repeat=3)]
+FILE_MIRROR = _symmetry(True, False, False)
+
+# White king squares kept in a table, by whether the ending has pawns
+KING_DOMAINS = {
+    False: [square for square in range(64) if 7 - _row(square) <= _col(square) <= 3],
+    True: [square for square in range(64) if _col(square) <= 3],
+}
+
+
+def _domain_symmetries(pawns):
+    """For every white king square the symmetries taking it into the domain"""
+    symmetries = [SYMMETRIES[0], FILE_MIRROR] if pawns else SYMMETRIES
+    domain = set(KING_DOMAINS[pawns])
+    return [[table for table in symmetries if table[square] in domain] for square in range(64)]
+
+
+KING_SYMMETRIES = {pawns: _domain_symmetries(pawns) for pawns in (False, True)}
+
+
+def split_signature(signature):
+    white, black = signature.split('v')
+    return white, black
+
+
+def _strength(pieces):
+    return (sum(PIECE_VALUES[p] for p in pieces), len(pieces),
+            tuple(-PIECE_ORDER.index(p) for p in pieces))
+
+
+def _sort_pieces(pieces):
+    return ''.join(sorted(pieces, key=PIECE_ORDER.index))
+
+
+def canonical_signature(white, black):
+    """Return (signature, flipped) with the stronger side as white"""
+    white, black = _sort_pieces(white), _sort_pieces(black)
+    if _strength(white) < _strength(black):
+        return f"{black}v{white}", True
+    return f"{white}v{black}", False
+
+
+def signature_pieces(signature):
+    """Piece types and colors in index order"""
+    white, black = split_signature(signature)
+    return list(white + black), [WHITE] * len(white) + [BLACK] * len(black)
+
+
+def table_size(signature):
+    domain = KING_DOMAINS['P' in signature]
+    return 2 * len(domain) * 64 ** (len(signature.replace('v', '')) - 1)
+
+
+def table_path(directory, signature):
+    return os.path.join(directory, signature + EXTENSION)
+
+
+def all_signatures(max_pieces):
+    """Every canonical ending with at least one extra piece, up to max_pieces in total"""
+    signatures = set()
+    for extra in range(1, max_pieces - 1):
+        for pieces in itertools.combinations_with_replacement(PIECE_ORDER[1:], extra):
+            for split in range(extra + 1):
+                white = 'K' + ''.join(pieces[:split])
+                black = 'K' + ''.join(pieces[split:])
+                signature, _ = canonical_signature(white, black)
+                if signature not in DRAWN_SIGNATURES:
+                    signatures.add(signature)
+    return sorted(signatures, key=lambda s: (len(s), s))
+
+
+def dependencies(signature):
+    """Tables reached from signature by a capture or a promotion"""
+    white, black = split_signature(signature)
+    result = set()
+    for side, pieces in ((0, white), (1, black)):
+        for i, piece in enumerate(pieces):
+            if piece == 'K':
+                continue
+            reduced = pieces[:i] + pieces[i + 1:]
+            children = [reduced]
+            if piece == 'P':
+                children += [reduced + promotion for promotion in PROMOTIONS]
+            for child in children:
+                child_signature, _ = canonical_signature(*((child, black) if side == 0 else (white, child)))
+                if child_signature != signature and child_signature not in DRAWN_SIGNATURES:
+                    result.add(child_signature)
+    return sorted(result)
+
+
+class Tablebase:
+    """Read-only access to generated tables through mmap"""
+
+    def __init__(self, directory):
+        if not os.path.isdir(directory):
+            raise FileNotFoundError(f"No tablebase directory {directory}")
+        self.directory = directory
+        self.tables = {}
+        self.positions = {}
+        self.signatures = sorted(name[:-len(EXTENSION)] for name in os.listdir(directory)
+                                 if name.endswith(EXTENSION))
+        self.max_pieces = max((len(s.replace('v', '')) for s in self.signatures), default=2)
+
+    def _table(self, signature):
+        table = self.tables.get(signature)
+        if table is None:
+            path = table_path(self.directory, signature)
+            if not os.path.exists(path):
+                return None
+            with open(path, 'rb') as f:
+                table = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, name, _ = HEADER.unpack_from(table, 0)
+            if magic != MAGIC or name.rstrip(b'\0').decode() != signature:
+                table.close()
+                raise ValueError(f"{path} is not a tablebase for {signature}")
+            if len(table) != HEADER.size + table_size(signature):
+                table.close()
+                raise ValueError(f"{path} is truncated")
+            self.tables[signature] = table
+        return table
+
+    def probe_pieces(self, pieces, side):
+        """Raw value for [(piece_type, color, square), ...] with side to move, None if unknown"""
+        white = _sort_pieces(p for p, color, _ in pieces if color == WHITE)
+        black = _sort_pieces(p for p, color, _ in pieces if color == BLACK)
+        signature, flipped = canonical_signature(white, black)
+        if signature in DRAWN_SIGNATURES:
+            return DRAW
+        table = self._table(signature)
+        if table is None:
+            return None
+
+        if flipped:
+            pieces = [(p, 1 - color, (7 - _row(sq)) * 8 + _col(sq)) for p, color, sq in pieces]
+            side = 1 - side
+        order = {(p, color): i for i, (p, color) in enumerate(zip(*signature_pieces(signature)))}
+        ordered = sorted(pieces, key=lambda piece: order[piece[0], piece[1]])
+        position = self.positions.get(signature)
+        if position is None:
+            position = self.positions[signature] = _Position(signature)
+        index = position.encode([square for _, _, square in ordered], side)
+        return table[HEADER.size + index]
+
+    def probe(self, board):
+        """(wdl, dtm) for the side to move of a chess.Board, or None
+
+        wdl is 1 for a win, 0 for a draw and -1 for a loss; dtm is the distance
+        to mate in plies (0 for draws).
+        """
+        pieces = []
+        for row, line in enumerate(board.board):
+            for col, piece in enumerate(line):
+                if piece:
+                    pieces.append((piece.piece_type, WHITE if piece.color == 'white' else BLACK, row * 8 + col))
+                    if len(pieces) > self.max_pieces:
+                        return None
+        value = self.probe_pieces(pieces, WHITE if board.current_turn == 'white' else BLACK)
+        return decode_value(value)
+
+    def close(self):
+        for table in self.tables.values():
+            table.close()
+        self.tables = {}
+
+
+def decode_value(value):
+    if value is None or value == ILLEGAL:
+        return None
+    if value == DRAW:
+        return 0, 0
+    dtm = value - 1
+    return (1 if dtm % 2 else -1), dtm
+
+
+def parse_fen(fen):
+    """Pieces and side to move from a FEN string, as used by Tablebase.probe_pieces"""
+    fields = fen.split()
+    pieces = []
+    for row, text in enumerate(fields[0].split('/')):
+        col = 0
+        for char in text:
+            if char.isdigit():
+                col += int(char)
+            else:
+                pieces.append((char.upper(), WHITE if char.isupper() else BLACK, row * 8 + col))
+                col += 1
+    return pieces, BLACK if len(fields) > 1 and fields[1] == 'b' else WHITE
+
+
+class _Position:
+    """Pieces of one table with helpers for move generation"""
+
+    def __init__(self, signature):
+        self.types, self.colors = signature_pieces(signature)
+        self.count = len(self.types)
+        self.kings = [self.types.index('K'), self.colors.index(BLACK)]
+        pawns = 'P' in self.types
+        self.domain = KING_DOMAINS[pawns]
+        self.slots = {square: slot for slot, square in enumerate(self.domain)}
+        self.symmetries = KING_SYMMETRIES[pawns]
+
+    def decode(self, index):
+        index, slot = divmod(index, len(self.domain))
+        squares = [self.domain[slot]]
+        for _ in range(self.count - 1):
+            squares.append(index % 64)
+            index //= 64
+        return squares, index
+
+    def encode(self, squares, side):
+        """Index of the position, or of its mirror image with the white king in the domain"""
+        best = None
+        for table in self.symmetries[squares[0]]:
+            index = side
+            for square in reversed(squares[1:]):
+                index = index * 64 + table[square]
+            index = index * len(self.domain) + self.slots[table[squares[0]]]
+            if best is None or index < best:
+                best = index
+        return best
+
+    def attacked(self, target, by_color, squares, occupied, skip=-1):
+        """Is target attacked by by_color? Piece skip (a captured piece) is ignored"""
+        for i in range(self.count):
+            if i == skip or self.colors[i] != by_color:
+                continue
+            square = squares[i]
+            piece = self.types[i]
+            if piece == 'K':
+                if target in KING_TARGETS[square]:
+                    return True
+            elif piece == 'N':
+                if target in KNIGHT_TARGETS[square]:
+                    return True
+            elif piece == 'P':
+                if target in PAWN_ATTACKS[by_color][square]:
+                    return True
+            else:
+                line = LINES[square][target]
+                if line and (piece == 'Q' or piece == line[0]):
+                    if not any(between in occupied for between in line[1]):
+                        return True
+        return False
+
+    def is_legal(self, squares, side):
+        """Distinct squares, no pawn on a back rank, side not to move is not in check"""
+        if len(set(squares)) != self.count:
+            return False
+        for i in range(self.count):
+            if self.types[i] == 'P' and _row(squares[i]) in (0, 7):
+                return False
+        occupied = set(squares)
+        return not self.attacked(squares[self.kings[1 - side]], side, squares, occupied)
+
+    def moves(self, squares, side):
+        """Legal moves as (piece, target, captured piece or -1, promotion or None)"""
+        occupied = {square: i for i, square in enumerate(squares)}
+        result = []
+        for i in range(self.count):
+            if self.colors[i] != side:
+                continue
+            for target, captured, promotion in self._piece_moves(i, squares, occupied):
+                # The move is legal if our king is not attacked afterwards
+                new_squares = list(squares)
+                new_squares[i] = target
+                new_occupied = set(new_squares[j] for j in range(self.count) if j != captured)
+                king = target if i == self.kings[side] else squares[self.kings[side]]
+                if not self.attacked(king, 1 - side, new_squares, new_occupied, skip=captured):
+                    result.append((i, target, captured, promotion))
+        return result
+
+    def _piece_moves(self, i, squares, occupied):
+        side = self.colors[i]
+        square = squares[i]
+        piece = self.types[i]
+
+        def capture(target):
+            j = occupied[target]
+            if self.colors[j] != side and self.types[j] != 'K':
+                return j
+            return None
+
+        if piece in ('K', 'N'):
+            for target in (KING_TARGETS if piece == 'K' else KNIGHT_TARGETS)[square]:
+                if target not in occupied:
+                    yield target, -1, None
+                else:
+                    j = capture(target)
+                    if j is not None:
+                        yield target, j, None
+        elif piece == 'P':
+            promotions = PROMOTIONS if _row(square + PAWN_STEP[side]) == PROMOTION_ROW[side] else [None]
+            target = square + PAWN_STEP[side]
+            if target not in occupied:
+                for promotion in promotions:
+                    yield target, -1, promotion
+                double = target + PAWN_STEP[side]
+                if _row(square) == PAWN_START_ROW[side] and double not in occupied:
+                    yield double, -1, None
+            for target in PAWN_ATTACKS[side][square]:
+                if target in occupied:
+                    j = capture(target)
+                    if j is not None:
+                        for promotion in promotions:
+                            yield target, j, promotion
+        else:
+            kinds = 'RB' if piece == 'Q' else piece
+            for kind in kinds:
+                for ray in SLIDER_RAYS[kind][square]:
+                    for target in ray:
+                        if target not in occupied:
+                            yield target, -1, None
+                        else:
+                            j = capture(target)
+                            if j is not None:
+                                yield target, j, None
+                            break
+
+    def unmoves(self, squares, side):
+        """Quiet moves of the side not to move that could have led here, as parent indexes"""
+        mover = 1 - side
+        occupied = set(squares)
+        for i in range(self.count):
+            if self.colors[i] != mover:
+                continue
+            square = squares[i]
+            piece = self.types[i]
+            origins = []
+            if piece in ('K', 'N'):
+                origins = [s for s in (KING_TARGETS if piece == 'K' else KNIGHT_TARGETS)[square]
+                           if s not in occupied]
+            elif piece == 'P':
+                origin = square - PAWN_STEP[mover]
+                if 1 <= _row(origin) <= 6 and origin not in occupied:
+                    origins.append(origin)
+                    double = origin - PAWN_STEP[mover]
+                    if _row(square) == PAWN_DOUBLE_ROW[mover] and double not in occupied:
+                        origins.append(double)
+            else:
+                kinds = 'RB' if piece == 'Q' else piece
+                for kind in kinds:
+                    for ray in SLIDER_RAYS[kind][square]:
+                        for origin in ray:
+                            if origin in occupied:
+                                break
+                            origins.append(origin)
+
+            for origin in origins:
+                parent = list(squares)
+                parent[i] = origin
+                parent_occupied = (occupied - {square}) | {origin}
+                # In the parent the side now to move must not have been left in check
+                if not self.attacked(parent[self.kings[side]], mover, parent, parent_occupied):
+                    yield self.encode(parent, mover)
+
+
+_worker_tablebase = None
+
+
+def _init_worker(directory):
+    global _worker_tablebase
+    _worker_tablebase = Tablebase(directory)
+
+
+def _classify_chunk(job):
+    """First pass over [start, stop): state, in-table child count and exit results
+
+    Runs in a worker process. Exits (captures and promotions) are looked up in
+    the already generated smaller tables.
+    """
+    signature, start, stop = job
+    position = _Position(signature)
+    size = stop - start
+    states = bytearray(size)
+    remaining = array('H', bytes(2 * size))
+    best_win = bytearray([ILLEGAL]) * size
+    max_win = bytearray(size)
+
+    for offset in range(size):
+        squares, side = position.decode(start + offset)
+        # Mirror images stored under another index count as illegal here
+        if not position.is_legal(squares, side) or position.encode(squares, side) != start + offset:
+            states[offset] = INVALID
+            continue
+        moves = position.moves(squares, side)
+        if not moves:
+            occupied = set(squares)
+            in_check = position.attacked(squares[position.kings[side]], 1 - side, squares, occupied)
+            states[offset] = MATE if in_check else STALEMATE
+            continue
+
+        # Moves to mirror images of one position reach the same index, the
+        # retrograde pass only sees each such child once
+        children = set()
+        count = 0
+        for i, target, captured, promotion in moves:
+            if captured < 0 and promotion is None:
+                child = list(squares)
+                child[i] = target
+                children.add(position.encode(child, 1 - side))
+                continue
+            pieces = [(promotion if j == i and promotion else position.types[j], position.colors[j],
+                       target if j == i else squares[j])
+                      for j in range(position.count) if j != captured]
+            value = _worker_tablebase.probe_pieces(pieces, 1 - side)
+            if value is None or value == ILLEGAL:
+                raise RuntimeError(f"{signature} needs a table that has not been generated")
+            if value == DRAW:
+                count += 1  # never becomes a win for the opponent, blocks a loss
+            elif (value - 1) % 2 == 0:
+                # Opponent is mated in value - 1 plies: we win one ply later
+                best_win[offset] = min(best_win[offset], value)
+                count += 1
+            else:
+                max_win[offset] = max(max_win[offset], value - 1)
+        remaining[offset] = count + len(children)
+
+    return start, bytes(states), remaining.tobytes(), bytes(best_win), bytes(max_win)
+
+
+def generate_table(signature, directory, processes=None, chunk_size=1 << 14, verbose=True):
+    """Generate one table; every table it depends on must already exist"""
+    started = time.perf_counter()
+    size = table_size(signature)
+    position = _Position(signature)
+
+    states = bytearray(size)
+    remaining = array('H', bytes(2 * size))
+    best_win = bytearray(size)
+    max_win = bytearray(size)
+
+    # Workers open the directory for the smaller tables, it has to exist
+    os.makedirs(directory, exist_ok=True)
+    jobs = [(signature, start, min(start + chunk_size, size)) for start in range(0, size, chunk_size)]
+    # Spawned, not forked: a parent that imported chess (pygame.init) or runs
+    # threads can leave locks held in forked children
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(processes, initializer=_init_worker, initargs=(directory,)) as pool:
+        for start, chunk_states, chunk_remaining, chunk_best, chunk_max in pool.imap_unordered(_classify_chunk, jobs):
+            stop = start + len(chunk_states)
+            states[start:stop] = chunk_states
+            remaining[start:stop] = array('H', chunk_remaining)
+            best_win[start:stop] = chunk_best
+            max_win[start:stop] = chunk_max
+
+    # Retrograde pass: resolve positions in order of distance to mate
+    values = bytearray(size)
+    resolved = bytearray(size)
+    buckets = [[] for _ in range(MAX_DTM + 2)]
+    for index in range(size):
+        state = states[index]
+        if state == INVALID:
+            values[index] = ILLEGAL
+            resolved[index] = 1
+        elif state == STALEMATE:
+            resolved[index] = 1
+        elif state == MATE:
+            buckets[0].append(index)
+        else:
+            if best_win[index] != ILLEGAL:
+                buckets[best_win[index]].append(index)
+            if remaining[index] == 0:
+                buckets[min(max_win[index] + 1, MAX_DTM + 1)].append(index)
+
+    for dtm in range(MAX_DTM + 1):
+        for index in buckets[dtm]:
+            if resolved[index]:
+                continue
+            if dtm % 2 and best_win[index] != dtm:
+                continue
+            resolved[index] = 1
+            values[index] = dtm + 1
+
+            squares, side = position.decode(index)
+            # Once per parent, to match the distinct children counted in remaining
+            for parent in set(position.unmoves(squares, side)):
+                if resolved[parent]:
+                    continue
+                if dtm % 2 == 0:
+                    # We get mated here, so the parent wins by moving here
+                    if best_win[parent] == ILLEGAL or dtm + 1 < best_win[parent]:
+                        best_win[parent] = dtm + 1
+                        buckets[dtm + 1].append(parent)
+                else:
+                    max_win[parent] = max(max_win[parent], dtm)
+                    remaining[parent] -= 1
+                    if remaining[parent] == 0:
+                        buckets[min(max_win[parent] + 1, MAX_DTM + 1)].append(parent)
+        buckets[dtm] = None
+
+    if any(not resolved[index] for index in buckets[MAX_DTM + 1]):
+        raise RuntimeError(f"{signature} has mates longer than {MAX_DTM} plies")
+
+    path = table_path(directory, signature)
+    with open(path + '.tmp', 'wb') as f:
+        f.write(HEADER.pack(MAGIC, signature.encode(), len(position.types)))
+        f.write(values)
+    os.replace(path + '.tmp', path)
+
+    if verbose:
+        wins = sum(1 for v in values if v not in (DRAW, ILLEGAL) and (v - 1) % 2)
+        longest = max((v - 1 for v in values if v not in (DRAW, ILLEGAL)), default=0)
+        print(f"{signature}: {size} positions, {wins} wins, longest mate {longest} plies, "
+              f"{time.perf_counter() - started:.1f}s")
+    return path
+
+
+def generate(signatures, directory, processes=None, verbose=True):
+    """Generate the given tables and everything they depend on, smallest first"""
+    done = set()
+
+    def visit(signature):
+        if signature in done or signature in DRAWN_SIGNATURES:
+            return
+        for dependency in dependencies(signature):
+            visit(dependency)
+        if not os.path.exists(table_path(directory, signature)):
+            generate_table(signature, directory, processes, verbose=verbose)
+        done.add(signature)
+
+    for signature in signatures:
+        visit(canonical_signature(*split_signature(signature))[0])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Endgame tablebase generator")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    gen_parser = commands.add_parser('generate', help="generate tables")
+    gen_parser.add_argument('--dir', default='tablebases')
+    gen_parser.add_argument('--tables', help=f"comma separated endings (default: {','.join(DEFAULT_TABLES)})")
+    gen_parser.add_argument('--pieces', type=int, choices=[3, 4],
+                            help="generate every ending with up to this many pieces")
+    gen_parser.add_argument('--processes', type=int, default=None,
+                            help="worker processes (default: one per CPU)")
+
+    probe_parser = commands.add_parser('probe', help="look up a FEN position")
+    probe_parser.add_argument('--dir', default='tablebases')
+    probe_parser.add_argument('fen')
+
+    args = parser.parse_args(argv)
+    if args.command == 'generate':
+        if args.pieces:
+            signatures = all_signatures(args.pieces)
+        elif args.tables:
+            signatures = [s.strip() for s in args.tables.split(',') if s.strip()]
+        else:
+            signatures = DEFAULT_TABLES
+        generate(signatures, args.dir, args.processes)
+        return 0
+
+    tablebase = Tablebase(args.dir)
+    pieces, side = parse_fen(args.fen)
+    result = decode_value(tablebase.probe_pieces(pieces, side))
+    if result is None:
+        print("not found")
+        return 1
+    wdl, dtm = result
+    print({1: f"win, mate in {dtm} plies", 0: "draw", -1: f"loss, mated in {dtm} plies"}[wdl])
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
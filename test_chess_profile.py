@@ -0,0 +1,44 @@
+import os
+import time
+
+import pytest
+
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+pytest.importorskip('pygame')
+
+import chess_profile
+from chess import AnalysisWorker, Board
+
+
+@pytest.fixture
+def profiling():
+    chess_profile.enable()
+    yield chess_profile
+    chess_profile.disable()
+
+
+def test_counts_board_calls_made_by_analysis_worker(profiling):
+    worker = AnalysisWorker(max_depth=2)
+    try:
+        generation = worker.submit(Board())
+        deadline = time.monotonic() + 60
+        depths = []
+        stats = profiling.report()
+        while stats['moves_generated'] == 0 and time.monotonic() < deadline:
+            depths += [r['depth'] for r in worker.poll() if r['generation'] == generation and 'depth' in r]
+            time.sleep(0.05)
+            stats = profiling.report()
+    finally:
+        worker.close()
+
+    assert depths[-1:] == [2]
+    assert stats['moves_generated'] > 0
+    assert stats['functions']['Board.get_valid_moves']['calls'] > 0
+    assert stats['functions']['Board.get_status']['calls'] > 0
+
+
+def test_disable_stops_instrumenting_new_workers(profiling):
+    assert AnalysisWorker.instrumentation is not None
+    profiling.disable()
+    assert AnalysisWorker.instrumentation is None
@@ -0,0 +1,124 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+pytest.importorskip('pygame')
+
+from chess import Board
+from chess_server import Connection, GameServer
+
+
+class FakeTransport:
+    def __init__(self):
+        self.buffered = 0
+        self.aborted = False
+
+    def get_write_buffer_size(self):
+        return self.buffered
+
+    def abort(self):
+        self.aborted = True
+
+
+class StalledWriter:
+    """Writer of a client that never reads: everything written stays buffered"""
+
+    def __init__(self):
+        self.transport = FakeTransport()
+
+    def is_closing(self):
+        return self.transport.aborted
+
+    def write(self, data):
+        self.transport.buffered += len(data)
+
+
+@pytest.mark.parametrize('fen, error', [
+    ('4k3/8/8/8/8/8/8/4R1K1 w - - 0 1', 'Side not to move is in check'),
+    ('4k3/8/8/8/8/8/8/4RK1K w - - 0 1', 'one king per side'),
+    ('4k3/8/8/8/8/8/8/6R1 w - - 0 1', 'both kings'),
+    ('P3k3/8/8/8/8/8/8/6K1 b - - 0 1', 'Pawn on the first or last rank'),
+    ('4k3/8/8/8/8/8/8/6Kp w - - 0 1', 'Pawn on the first or last rank'),
+    ('4k3/8/8 w - - 0 1', 'Invalid FEN'),
+])
+def test_set_fen_rejects_impossible_positions(fen, error):
+    with pytest.raises(ValueError, match=error):
+        Board.from_fen(fen)
+    response = GameServer().dispatch({'op': 'new', 'fen': fen})
+    assert response['ok'] is False and error in response['error']
+
+
+def test_set_fen_rejects_empty_fen():
+    with pytest.raises(ValueError, match='Invalid FEN'):
+        Board.from_fen('')
+
+
+def test_set_fen_accepts_side_to_move_in_check():
+    board = Board.from_fen('4k3/8/8/8/8/8/8/4R1K1 b - - 0 1')
+    assert board.get_status() == 'check'
+
+
+@pytest.mark.parametrize('request_, error', [
+    ({'op': 'new', 'fen': 5}, 'fen must be a string'),
+    ({'op': 'move', 'game': '1', 'move': 5}, 'move must be a string'),
+    ({'op': 'move', 'game': [1], 'move': 'e2e4'}, 'game must be a string or an integer'),
+    ({'op': 'state', 'game': '99'}, 'unknown game 99'),
+    ({'op': 'fly', 'game': '1'}, 'unknown op fly'),
+    ({'op': 'move', 'game': '1', 'move': 'e2e5'}, 'illegal move e2e5'),
+    ({'op': 'move', 'game': '1', 'move': 'z9'}, 'Invalid move: z9'),
+    ([1, 2], 'request must be a JSON object'),
+])
+def test_dispatch_reports_bad_requests(request_, error):
+    server = GameServer()
+    server.dispatch({'op': 'new'})
+    response = server.dispatch(request_)
+    assert response['ok'] is False
+    assert response['error'] == error
+
+
+def test_dispatch_accepts_integer_game_and_echoes_id():
+    server = GameServer()
+    server.dispatch({'op': 'new'})
+    response = server.dispatch({'op': 'move', 'game': 1, 'move': 'e2e4', 'id': 'a'})
+    assert response['ok'] is True and response['plies'] == 1 and response['id'] == 'a'
+
+
+def test_stalled_subscriber_is_dropped():
+    server = GameServer(max_buffer=1000)
+    game = server.dispatch({'op': 'new'})['game']
+    connection = Connection(StalledWriter(), server.max_buffer)
+    assert server.dispatch({'op': 'subscribe', 'game': game}, connection)['ok']
+
+    moves = ['g1f3', 'g8f6', 'f3g1', 'f6g8'] * 10
+    for move in moves:
+        assert server.dispatch({'op': 'move', 'game': game, 'move': move})['ok']
+
+    transport = connection.writer.transport
+    assert transport.aborted
+    assert transport.buffered <= 1000 + 200
+    assert connection not in server.sessions[game].subscribers
+    assert server.stats['dropped'] == 1
+
+
+def test_bad_line_keeps_connection_open():
+    async def session():
+        server = GameServer()
+        listener = await asyncio.start_server(server.handle_client, '127.0.0.1', 0)
+        port = listener.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        responses = []
+        for line in [b'not json\n', b'{"op": "new", "fen": 5}\n', b'{"op": "new"}\n']:
+            writer.write(line)
+            responses.append(json.loads(await reader.readline()))
+        writer.close()
+        await writer.wait_closed()
+        listener.close()
+        await listener.wait_closed()
+        return responses
+
+    responses = asyncio.run(session())
+    assert [r['ok'] for r in responses] == [False, False, True]
@@ -0,0 +1,54 @@
+import os
+
+import pytest
+
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+pygame = pytest.importorskip('pygame')
+
+from chess import Board
+from chess_server import GameServer
+from chess_tournament import TournamentView
+
+
+@pytest.fixture
+def screen():
+    pygame.display.init()
+    yield pygame.display.set_mode((400, 300))
+    pygame.display.quit()
+
+
+def test_board_moved_by_server_session_is_redrawn(screen):
+    server = GameServer()
+    game = server.dispatch({'op': 'new'})['game']
+    server.dispatch({'op': 'move', 'game': game, 'move': 'e2e4'})
+    board = server.sessions[game].board
+
+    view = TournamentView(screen, [board], min_interval=0)
+    assert view.update(0) == [screen.get_rect()]
+    assert view.update(1) == []
+
+    server.dispatch({'op': 'move', 'game': game, 'move': 'f7f6'})
+    server.dispatch({'op': 'move', 'game': game, 'move': 'd1h5'})
+    tile = view.tiles[0]
+    assert view.update(2) == [tile.rect]
+    assert tile.status == 'check'
+    assert view.update(3) == []
+
+
+def test_taken_back_move_and_new_board_are_redrawn(screen):
+    board = Board()
+    view = TournamentView(screen, [board], min_interval=0)
+    view.update(0)
+    tile = view.tiles[0]
+
+    undo = board.make_move(6, 4, 4, 4)
+    assert tile.needs_redraw(1, 0)
+    view.update(1)
+    board.undo_move(undo)
+    assert tile.needs_redraw(2, 0)
+    view.update(2)
+
+    tile.board = Board.from_fen('7k/8/6K1/8/8/8/8/5Q2 w - - 0 1')
+    assert view.update(3) == [tile.rect]
+    assert not tile.needs_redraw(4, 0)
@@ -0,0 +1,99 @@
+import io
+import os
+import time
+
+import pytest
+
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+pytest.importorskip('pygame')
+
+from chess import Board
+from chess_uci import UCIEngine
+
+
+def run(engine, *lines):
+    """Feed command lines to engine, wait for a started search, return the new output lines"""
+    start = len(engine.output.getvalue())
+    for line in lines:
+        engine.handle(line)
+    if engine.search_thread:
+        engine.search_thread.join(timeout=30)
+    return engine.output.getvalue()[start:].splitlines()
+
+
+@pytest.fixture
+def engine():
+    engine = UCIEngine(output=io.StringIO())
+    yield engine
+    engine.stop_search()
+
+
+def fen_after(*moves):
+    engine = UCIEngine(output=io.StringIO())
+    engine.handle(f"position startpos moves {' '.join(moves)}")
+    return engine.board.to_fen()
+
+
+def test_position_reuses_common_prefix(engine):
+    run(engine, "position startpos moves e2e4 e7e5")
+    first_undo = engine.undo_stack[0]
+
+    run(engine, "position startpos moves e2e4 e7e5 g1f3")
+    assert engine.moves == ['e2e4', 'e7e5', 'g1f3']
+    assert engine.undo_stack[0] is first_undo
+    assert engine.board.to_fen() == fen_after('e2e4', 'e7e5', 'g1f3')
+
+    # Takes back g1f3 and e7e5 only
+    run(engine, "position startpos moves e2e4 d7d5")
+    assert engine.moves == ['e2e4', 'd7d5']
+    assert engine.undo_stack[0] is first_undo
+    assert engine.board.to_fen() == fen_after('e2e4', 'd7d5')
+
+    run(engine, "position startpos")
+    assert engine.moves == []
+    assert engine.board.to_fen() == Board().to_fen()
+
+
+def test_castling_is_rejected_and_go_still_answers(engine):
+    output = run(engine, "position startpos moves e2e4 e7e5 e1g1")
+    assert output == ["info string error illegal move e1g1 (castling is not supported)"]
+
+    output = run(engine, "go depth 1")
+    assert output[-1] == "bestmove 0000"
+    assert engine.search_thread is None
+
+    # A valid position clears the error
+    output = run(engine, "position startpos moves e2e4", "go depth 1")
+    assert output[-1].startswith("bestmove ") and output[-1] != "bestmove 0000"
+
+
+@pytest.mark.parametrize('command', [
+    "position fen 8/8/8/8/8/8/8/8 w - - 0 1",
+    "position startpos moves e2e5",
+    "position startpos moves e2",
+    "position",
+])
+def test_failed_position_answers_go_with_null_move(engine, command):
+    output = run(engine, command, "go depth 1")
+    assert output[0].startswith("info string error ")
+    assert output[-1] == "bestmove 0000"
+
+
+def test_go_depth_zero_is_a_limit(engine):
+    started = time.perf_counter()
+    output = run(engine, "position startpos", "go depth 0")
+    assert time.perf_counter() - started < 5
+    assert output[-1].startswith("bestmove ") and output[-1] != "bestmove 0000"
+
+
+def test_go_infinite_waits_for_stop(engine):
+    engine.handle("position fen 7k/8/6K1/8/8/8/8/5Q2 w - - 0 1")
+    engine.handle("go infinite")
+    time.sleep(0.5)
+    # The mate is found, but bestmove is held back until stop
+    assert "score mate 1" in engine.output.getvalue()
+    assert "bestmove" not in engine.output.getvalue()
+
+    output = run(engine, "stop")
+    assert output[-1].startswith("bestmove ")
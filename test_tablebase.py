@@ -0,0 +1,99 @@
+import os
+import random
+
+import pytest
+
+import tablebase
+
+SAMPLES = 300
+
+
+@pytest.fixture(scope='module')
+def tables(tmp_path_factory):
+    directory = str(tmp_path_factory.mktemp('tablebases'))
+    tablebase.generate(['KQvK', 'KRvK'], directory, processes=1, verbose=False)
+    tables = tablebase.Tablebase(directory)
+    yield tables
+    tables.close()
+
+
+def table_values(tables, signature):
+    return tables._table(signature)[tablebase.HEADER.size:]
+
+
+def to_fen(signature, squares, side):
+    """FEN for the pieces of signature on squares"""
+    types, colors = tablebase.signature_pieces(signature)
+    board = [[''] * 8 for _ in range(8)]
+    for piece, color, square in zip(types, colors, squares):
+        board[square // 8][square % 8] = piece if color == tablebase.WHITE else piece.lower()
+    rows = []
+    for row in board:
+        text, empty = '', 0
+        for char in row:
+            if char:
+                text += (str(empty) if empty else '') + char
+                empty = 0
+            else:
+                empty += 1
+        rows.append(text + (str(empty) if empty else ''))
+    return f"{'/'.join(rows)} {'w' if side == tablebase.WHITE else 'b'} - - 0 1"
+
+
+@pytest.mark.parametrize('signature, longest_win, longest_loss', [
+    ('KQvK', 19, 20),
+    ('KRvK', 31, 32),
+])
+def test_longest_mates(tables, signature, longest_win, longest_loss):
+    distances = [value - 1 for value in table_values(tables, signature)
+                 if value not in (tablebase.DRAW, tablebase.ILLEGAL)]
+    assert max(dtm for dtm in distances if dtm % 2) == longest_win
+    assert max(dtm for dtm in distances if dtm % 2 == 0) == longest_loss
+
+
+def test_folded_size(tables):
+    # White king in the a1-d1-d4 triangle: 10 squares instead of 64
+    assert len(table_values(tables, 'KQvK')) == 2 * 10 * 64 ** 2
+    # With pawns only the left-right mirror applies: files a-d
+    assert tablebase.table_size('KPvK') == 2 * 32 * 64 ** 2
+
+
+def test_mirrored_positions_agree(tables):
+    pieces, side = tablebase.parse_fen('8/8/8/4k3/8/8/8/4KQ2 w - - 0 1')
+    value = tables.probe_pieces(pieces, side)
+    for symmetry in tablebase.SYMMETRIES:
+        mirrored = [(piece, color, symmetry[square]) for piece, color, square in pieces]
+        assert tables.probe_pieces(mirrored, side) == value
+
+
+@pytest.mark.parametrize('signature', ['KQvK', 'KRvK'])
+def test_bellman_consistency(tables, signature):
+    """Every sampled value follows from the values after each move chess.Board allows"""
+    os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    pytest.importorskip('pygame')
+    from chess import Board
+
+    values = table_values(tables, signature)
+    position = tablebase._Position(signature)
+    rng = random.Random(0)
+    indexes = [i for i in range(len(values)) if values[i] != tablebase.ILLEGAL]
+
+    for index in rng.sample(indexes, SAMPLES):
+        squares, side = position.decode(index)
+        board = Board.from_fen(to_fen(signature, squares, side))
+        children = []
+        for move in board.get_all_valid_moves():
+            undo = board.make_move(*move)
+            children.append(tables.probe(board))
+            board.undo_move(undo)
+
+        if not children:
+            expected = (-1, 0) if board.is_in_check(board.current_turn) else (0, 0)
+        elif any(wdl == -1 for wdl, _ in children):
+            expected = (1, 1 + min(dtm for wdl, dtm in children if wdl == -1))
+        elif all(wdl == 1 for wdl, _ in children):
+            expected = (-1, 1 + max(dtm for _, dtm in children))
+        else:
+            expected = (0, 0)
+        assert tablebase.decode_value(values[index]) == expected, board.to_fen()